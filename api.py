@@ -0,0 +1,333 @@
+# Local HTTP/WebSocket API over a GateService, on plain asyncio streams so an
+# edge box needs no web framework.
+#
+#   GET    /vehicles?offset=0&limit=50     GET /vehicles/<plate>
+#   POST   /vehicles  {"number_plate", "owner_name", "vehicle_type", "allowed"}
+#   DELETE /vehicles/<plate>
+#   GET    /slots?offset=0&limit=50
+#   GET    /events?since=<unix ts>&until=<unix ts>&limit=500
+#   GET    /stats
+#   GET    /scheduler   latency budget, current sampling rate/resolution and whether the budget is met
+#   GET    /metrics     Prometheus text: per-stage latency quantiles, counters, queue depths
+#   GET    /profile?seconds=10   folded stacks of every thread, sampled for that long (max 120)
+#   GET    /ws     WebSocket: one JSON message per gate/slot/vehicle event
+#
+# Writes (POST/DELETE) need "Content-Type: application/json" for bodies and,
+# when the API has a token, "Authorization: Bearer <token>"; without a token
+# only clients on this machine may write. No CORS headers are sent, so browser
+# pages from other origins can neither read responses nor post JSON. CORS does
+# not cover WebSockets, so /ws refuses any handshake whose Origin is not this
+# host, and with a token it needs it too, as the Bearer header or ?token=.
+import asyncio
+import base64
+import hashlib
+import hmac
+import ipaddress
+import json
+import queue
+import struct
+import threading
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from eventlog import iter_events
+from events import DENIED, ENTRY, EXIT, SLOT_CHANGED, VEHICLE_CHANGED
+from metrics import METRICS, sample_profile
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B3B"
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+           403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           415: "Unsupported Media Type"}
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+MAX_BODY = 64 * 1024
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _int(params, name, default, limit=None):
+    try:
+        value = int(params.get(name, [default])[0])
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    return min(max(value, 0), limit) if limit else max(value, 0)
+
+
+def _float(params, name):
+    if name not in params:
+        return None
+    try:
+        return float(params[name][0])
+    except ValueError:
+        raise HttpError(400, f"{name} must be a number")
+
+
+class GateApi:
+    def __init__(self, service, host="127.0.0.1", port=8080, max_page=500, token=None):
+        self.service = service
+        self.repo = service.repo
+        self.host = host
+        self.port = port
+        self.max_page = max_page
+        self.token = token
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self.stop_event = threading.Event()
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        subscription = self.service.bus.subscribe([ENTRY, EXIT, DENIED, SLOT_CHANGED, VEHICLE_CHANGED])
+        threading.Thread(target=self._pump, args=(subscription,), daemon=True).start()
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server:
+            self.server.close()
+
+    # Bus -> every connected WebSocket client, hopping onto the event loop
+    def _pump(self, subscription):
+        while not self.stop_event.is_set():
+            try:
+                event = subscription.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            message = json.dumps(event._asdict())
+            self.loop.call_soon_threadsafe(self._broadcast, message)
+
+    def _broadcast(self, message):
+        for client in list(self.clients):
+            if client.full():
+                client.get_nowait()
+            client.put_nowait(message)
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            url = urlsplit(target)
+            path = unquote(url.path).rstrip("/") or "/"
+            params = parse_qs(url.query)
+
+            if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                self._authorize_websocket(headers, params)
+                await self._websocket(reader, writer, headers)
+                return
+            if method in WRITE_METHODS:
+                self._authorize(headers, writer.get_extra_info("peername"))
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY:
+                raise HttpError(413, "body too large")
+            if length and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+                raise HttpError(415, "body must be application/json")
+            body = await reader.readexactly(length) if length else b""
+            status, payload = await self._route(method, path, params, body)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "malformed request"}
+        except ConnectionError:
+            return
+        await self._respond(writer, status, payload)
+
+    # str payloads (metrics, profiles) go out as plain text, everything else as JSON
+    async def _respond(self, writer, status, payload):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), "text/plain; charset=utf-8"
+        else:
+            body, content_type = b"" if payload is None else json.dumps(payload).encode(), "application/json"
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n")
+        try:
+            writer.write(head.encode() + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _authorize(self, headers, peer):
+        if self.token:
+            if not self._token_matches(_bearer(headers)):
+                raise HttpError(401, "missing or wrong API token")
+        elif not _is_loopback(peer):
+            raise HttpError(403, "writes from other hosts need an API token")
+
+    # Browsers cannot set headers on a WebSocket, so the token may also come as ?token=
+    def _authorize_websocket(self, headers, params):
+        origin = headers.get("origin")
+        if origin is not None and urlsplit(origin).netloc.lower() != headers.get("host", "").lower():
+            raise HttpError(403, "cross-origin WebSocket refused")
+        if self.token and not self._token_matches(params.get("token", [_bearer(headers)])[0]):
+            raise HttpError(401, "missing or wrong API token")
+
+    def _token_matches(self, supplied):
+        return supplied is not None and hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    async def _route(self, method, path, params, body):
+        parts = path.strip("/").split("/")
+        run = asyncio.to_thread
+        if parts == ["vehicles"]:
+            if method == "GET":
+                offset, limit = _int(params, "offset", 0), _int(params, "limit", 50, self.max_page)
+                vehicles = await run(self.repo.vehicle_page, offset, limit)
+                return 200, {"total": await run(self.repo.count_vehicles),
+                             "vehicles": [vehicle._asdict() for vehicle in vehicles]}
+            if method == "POST":
+                return await self._save_vehicle(body)
+        elif parts[0] == "vehicles" and len(parts) == 2:
+            plate = parts[1].upper()
+            if method == "GET":
+                vehicle = await run(self.repo.get_vehicle, plate)
+                if vehicle is None:
+                    raise HttpError(404, f"{plate} is not registered")
+                slot = await run(self.repo.get_assigned_slot, plate)
+                return 200, dict(vehicle._asdict(), slot=slot)
+            if method == "DELETE":
+                await run(self.repo.delete_vehicle, plate)
+                return 204, None
+        elif parts == ["slots"] and method == "GET":
+            offset, limit = _int(params, "offset", 0), _int(params, "limit", 50, self.max_page)
+            slots = await run(self.repo.slot_page, offset, limit)
+            return 200, {"total": await run(self.repo.count_slots), "slots": [slot._asdict() for slot in slots]}
+        elif parts == ["events"] and method == "GET":
+            since, until = _float(params, "since"), _float(params, "until")
+            limit = _int(params, "limit", 500, 10000)
+            events = await run(lambda: [row._asdict() for row, _ in zip(iter_events(self.repo, since, until),
+                                                                          range(limit))])
+            return 200, {"events": events}
+        elif parts == ["stats"] and method == "GET":
+            return 200, await run(self.service.report)
+        elif parts == ["scheduler"] and method == "GET":
+            pipeline = self.service.pipeline
+            if pipeline is None or pipeline.scheduler is None:
+                raise HttpError(404, "no adaptive scheduler running")
+            return 200, pipeline.scheduler.status()
+        elif parts == ["metrics"] and method == "GET":
+            return 200, METRICS.prometheus()
+        elif parts == ["profile"] and method == "GET":
+            seconds = min(_float(params, "seconds") or 10.0, 120.0)
+            return 200, await run(sample_profile, seconds)
+        else:
+            raise HttpError(404, f"no route for {path}")
+        raise HttpError(405, f"{method} not allowed on {path}")
+
+    async def _save_vehicle(self, body):
+        from plates import is_valid_plate
+
+        try:
+            data = json.loads(body or b"{}")
+            plate = str(data["number_plate"]).upper()
+            owner, vehicle_type = str(data["owner_name"]), str(data["vehicle_type"])
+            allowed = data.get("allowed")
+        except (ValueError, KeyError, TypeError):
+            raise HttpError(400, "expected JSON with number_plate, owner_name and vehicle_type")
+        # Left out, an existing vehicle keeps its access; "0" and other strings are refused, not read as truthy
+        if allowed is not None:
+            if allowed not in (0, 1) or not isinstance(allowed, (bool, int)):
+                raise HttpError(400, "allowed must be true/false or 1/0")
+            allowed = int(allowed)
+        if not is_valid_plate(plate):
+            raise HttpError(400, f"{plate} is not a valid plate")
+        created = await asyncio.to_thread(self.repo.save_vehicle, plate, owner, vehicle_type, allowed)
+        return (201 if created else 200), {"number_plate": plate, "created": created}
+
+    # WebSocket (RFC 6455): server pushes text frames, reads only close/ping
+
+    async def _websocket(self, reader, writer, headers):
+        accept = base64.b64encode(hashlib.sha1((headers.get("sec-websocket-key", "") + WS_GUID).encode()).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+        outbox = asyncio.Queue(maxsize=256)
+        self.clients.add(outbox)
+        listener = asyncio.ensure_future(self._ws_read(reader, writer))
+        try:
+            while not listener.done():
+                sender = asyncio.ensure_future(outbox.get())
+                done, _ = await asyncio.wait({sender, listener}, return_when=asyncio.FIRST_COMPLETED)
+                if sender not in done:
+                    sender.cancel()
+                    break
+                writer.write(_ws_frame(0x1, sender.result().encode()))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Client gone, or the loop is shutting down under us
+            pass
+        finally:
+            self.clients.discard(outbox)
+            listener.cancel()
+            writer.close()
+
+    async def _ws_read(self, reader, writer):
+        try:
+            await self._ws_frames(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+    async def _ws_frames(self, reader, writer):
+        while True:
+            head = await reader.readexactly(2)
+            opcode, length = head[0] & 0x0F, head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", await reader.readexactly(8))[0]
+            mask = await reader.readexactly(4) if head[1] & 0x80 else b"\0\0\0\0"
+            if length > MAX_BODY:
+                return
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(length)))
+            if opcode == 0x8:
+                writer.write(_ws_frame(0x8, payload[:2]))
+                return
+            if opcode == 0x9:
+                writer.write(_ws_frame(0xA, payload))
+
+
+def _ws_frame(opcode, payload):
+    length = len(payload)
+    if length < 126:
+        head = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    return head + payload
+
+
+def _bearer(headers):
+    scheme, _, supplied = headers.get("authorization", "").partition(" ")
+    return supplied.strip() if scheme.lower() == "bearer" else None
+
+
+def _is_loopback(peer):
+    try:
+        return ipaddress.ip_address(peer[0]).is_loopback
+    except (TypeError, ValueError, IndexError):
+        return False
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
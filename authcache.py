@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+
+
+# In-memory copy of the vehicles table and of slot occupancy, so gate
+# decisions never query SQLite. Writes made through the repository mark the
+# affected keys dirty via its change stream and they are re-read on the next
+# lookup. Anything else that commits to the database file (setup_database.py,
+# another process, the sqlite3 shell) is picked up by a poll thread from the
+# trigger-maintained change_log: changed keys are marked dirty the same way,
+# and only a bulk change (or log rows the repository pruned before they were
+# seen) costs a full reload. Event log inserts do not touch vehicles or slots and cost nothing.
+class AuthCache:
+    def __init__(self, repo, poll_interval=1.0, bulk_refresh=256, prune_every=60):
+        self.repo = repo
+        self.poll_interval = poll_interval
+        self.bulk_refresh = bulk_refresh
+        self.prune_every = prune_every
+        self.vehicles = {}
+        self.slot_of = {}
+        self.plate_in = {}
+        self.lock = threading.Lock()
+        self.dirty_vehicles = set()
+        self.dirty_slots = set()
+        self.reloading = 0
+        self.changed_vehicles = set()
+        self.changed_slots = set()
+        self.reloads = 0
+        self.hits = 0
+        self.misses = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+        repo.subscribe(self._on_change)
+        self.seen_change = repo.last_change()
+        self.reload()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=self.poll_interval + 1)
+
+    def reload(self):
+        with self.lock:
+            self.reloading += 1
+        try:
+            vehicles = {vehicle.number_plate: vehicle for vehicle in self.repo.list_vehicles()}
+            plate_in = {slot.slot_number: slot.number_plate for slot in self.repo.list_slots() if slot.number_plate}
+        finally:
+            with self.lock:
+                self.reloading -= 1
+        with self.lock:
+            self.vehicles = vehicles
+            self.plate_in = plate_in
+            self.slot_of = {plate: slot_number for slot_number, plate in plate_in.items()}
+            self.reloads += 1
+            # Keys written while the snapshot was read may be older in it than what
+            # _refresh applied meanwhile; read them again
+            self.dirty_vehicles |= self.changed_vehicles
+            self.dirty_slots |= self.changed_slots
+            if not self.reloading:
+                self.changed_vehicles, self.changed_slots = set(), set()
+
+    # Repository writes only mark keys dirty; they are re-read on the next lookup
+    def _on_change(self, kind, key):
+        with self.lock:
+            (self.dirty_vehicles if kind == "vehicle" else self.dirty_slots).add(key)
+            if self.reloading:
+                (self.changed_vehicles if kind == "vehicle" else self.changed_slots).add(key)
+
+    def _refresh(self):
+        with self.lock:
+            plates, self.dirty_vehicles = self.dirty_vehicles, set()
+            slots, self.dirty_slots = self.dirty_slots, set()
+        if not plates and not slots:
+            return
+        # A bulk import dirties thousands of plates; one full read beats a query each
+        if len(plates) + len(slots) > self.bulk_refresh:
+            self.reload()
+            return
+        vehicles = {plate: self.repo.get_vehicle(plate) for plate in plates}
+        rows = {slot_number: self.repo.get_slot_row(slot_number) for slot_number in slots}
+        with self.lock:
+            for plate, vehicle in vehicles.items():
+                if vehicle is None:
+                    self.vehicles.pop(plate, None)
+                else:
+                    self.vehicles[plate] = vehicle
+            for slot_number, row in rows.items():
+                previous = self.plate_in.pop(slot_number, None)
+                if previous is not None and self.slot_of.get(previous) == slot_number:
+                    del self.slot_of[previous]
+                if row is not None and row.number_plate:
+                    self.plate_in[slot_number] = row.number_plate
+                    self.slot_of[row.number_plate] = slot_number
+
+    # Also trims the change log every prune_every polls, for the gate's own writes
+    def _poll(self):
+        polls = 0
+        while not self.stop_event.wait(self.poll_interval):
+            polls += 1
+            try:
+                self._follow_changes()
+                if polls % self.prune_every == 0:
+                    self.repo.prune_changes()
+            except sqlite3.Error:
+                # Busy or locked: the same rows are read on the next poll
+                continue
+
+    # Our own writes show up here too; re-marking their keys costs one row read each
+    def _follow_changes(self):
+        rows = self.repo.changes_since(self.seen_change, self.bulk_refresh + 1)
+        if not rows:
+            return
+        if len(rows) > self.bulk_refresh or rows[0][0] != self.seen_change + 1:
+            self.seen_change = self.repo.last_change()
+            self.reload()
+        else:
+            self.seen_change = rows[-1][0]
+            for _, kind, key in rows:
+                self._on_change(kind, key)
+
+    # Vehicle row for the plate, or None when it is not registered
+    def vehicle(self, number_plate):
+        self._refresh()
+        with self.lock:
+            vehicle = self.vehicles.get(number_plate)
+            if vehicle is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return vehicle
+
+    def assigned_slot(self, number_plate):
+        self._refresh()
+        with self.lock:
+            return self.slot_of.get(number_plate)
+
+    def stats(self):
+        with self.lock:
+            return {"vehicles": len(self.vehicles), "occupied": len(self.plate_in), "hits": self.hits,
+                    "misses": self.misses, "reloads": self.reloads}
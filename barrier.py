@@ -0,0 +1,277 @@
+import bisect
+import os
+import queue
+import threading
+import time
+
+import serial
+
+from events import ENTRY, EXIT
+from metrics import METRICS
+
+OPEN = b'O'
+CLOSE = b'C'
+
+
+class LatencyHistogram:
+    def __init__(self, bounds_ms=(5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)):
+        self.bounds_ms = list(bounds_ms)
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.bounds_ms, seconds * 1000)] += 1
+            self.total += 1
+
+    # Upper bucket bound holding the given quantile, None when empty
+    def percentile(self, q):
+        with self.lock:
+            if not self.total:
+                return None
+            target = q * self.total
+            running = 0
+            for bound, count in zip(self.bounds_ms + [float("inf")], self.counts):
+                running += count
+                if running >= target:
+                    return bound
+        return None
+
+    def snapshot(self):
+        with self.lock:
+            buckets = {f"le_{bound}ms": count for bound, count in zip(self.bounds_ms, self.counts)}
+            buckets["inf"] = self.counts[-1]
+            total = self.total
+        return {"count": total, "buckets": buckets,
+                "p50_ms": self.percentile(0.5), "p95_ms": self.percentile(0.95)}
+
+
+def open_serial(port, baudrate=9600, write_timeout=1.0):
+    # serial_for_url also accepts loop:// and pty paths for testing without hardware
+    return serial.serial_for_url(port, baudrate=baudrate, timeout=0, write_timeout=write_timeout)
+
+
+# Barrier state machine on its own thread. open() requests are queued; an open
+# arriving while the barrier is already up just extends the hold time, so a
+# queue of cars passes without close/open cycles. Serial errors drop the link
+# and it is reopened on the next command. An open that cannot be sent (link
+# down, reconnect rate-limited) stays pending and is retried until it goes out
+# or open_deadline seconds pass; further opens meanwhile join it.
+class BarrierController:
+    def __init__(self, port, baudrate=9600, hold_seconds=3, settle_seconds=2, reconnect_interval=2.0,
+                 write_timeout=1.0, connect=None, open_deadline=10.0):
+        self.port = port
+        self.hold_seconds = hold_seconds
+        self.settle_seconds = settle_seconds
+        self.reconnect_interval = reconnect_interval
+        self.open_deadline = open_deadline
+        self.connect = connect or (lambda: open_serial(port, baudrate, write_timeout))
+
+        self.commands = queue.Queue()
+        self.device = None
+        self.last_attempt = 0.0
+        self.is_open = False
+        self.close_at = 0.0
+        self.pending_open = None
+        self.pending_until = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+        self.latency = LatencyHistogram()
+        self.opens = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.reconnects = 0
+        self.missed = 0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.commands.put(None)
+        self.thread.join(timeout=self.hold_seconds + 2)
+        self._disconnect()
+
+    def open(self, requested_at=None):
+        self.commands.put((OPEN, requested_at or time.time()))
+
+    def close(self):
+        self.commands.put((CLOSE, time.time()))
+
+    # Open the barrier for every entry/exit published on the bus
+    def attach(self, bus):
+        subscription = bus.subscribe([ENTRY, EXIT])
+
+        def pump():
+            while not self.stop_event.is_set():
+                try:
+                    event = subscription.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                self.open(event.timestamp)
+
+        threading.Thread(target=pump, daemon=True).start()
+        return self
+
+    @property
+    def connected(self):
+        return self.device is not None
+
+    def _connect(self):
+        if self.device is not None:
+            return True
+        now = time.monotonic()
+        if now - self.last_attempt < self.reconnect_interval:
+            return False
+        self.last_attempt = now
+        try:
+            self.device = self.connect()
+        except (serial.SerialException, OSError):
+            self.failures += 1
+            return False
+        self.reconnects += 1
+        # Arduino boards reset when the port opens
+        if self.settle_seconds:
+            time.sleep(self.settle_seconds)
+        return True
+
+    def _disconnect(self):
+        if self.device is not None:
+            try:
+                self.device.close()
+            except (serial.SerialException, OSError):
+                pass
+            self.device = None
+
+    def _write(self, command):
+        for _ in range(2):
+            if not self._connect():
+                return False
+            try:
+                with METRICS.timer("barrier_write"):
+                    self.device.write(command)
+                    self.device.flush()
+                return True
+            except (serial.SerialException, OSError):
+                self.failures += 1
+                METRICS.inc("barrier_write_failures")
+                self._disconnect()
+                self.last_attempt = 0.0
+        return False
+
+    def _wait_time(self):
+        if self.is_open:
+            return max(0.0, self.close_at - time.monotonic())
+        if self.pending_open is not None:
+            return min(0.1, self.reconnect_interval)
+        return 0.5
+
+    def _try_open(self):
+        if self._write(OPEN):
+            self.is_open = True
+            self.opens += 1
+            self.latency.record(time.time() - self.pending_open)
+            self.close_at = time.monotonic() + self.hold_seconds
+            self.pending_open = None
+        elif time.monotonic() >= self.pending_until:
+            self.missed += 1
+            METRICS.inc("barrier_missed_opens")
+            self.pending_open = None
+
+    def _run(self):
+        self._connect()
+        while not self.stop_event.is_set():
+            try:
+                item = self.commands.get(timeout=self._wait_time())
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+
+            if item:
+                command, requested_at = item
+                if command == OPEN:
+                    if self.is_open:
+                        self.coalesced += 1
+                        self.close_at = time.monotonic() + self.hold_seconds
+                    else:
+                        if self.pending_open is None:
+                            self.pending_open = requested_at
+                        else:
+                            self.coalesced += 1
+                        self.pending_until = time.monotonic() + self.open_deadline
+                elif command == CLOSE:
+                    self.close_at = 0.0
+                    self.pending_open = None
+
+            if self.pending_open is not None and not self.is_open:
+                self._try_open()
+
+            if self.is_open and time.monotonic() >= self.close_at:
+                self._write(CLOSE)
+                self.is_open = False
+
+        if self.is_open:
+            self._write(CLOSE)
+            self.is_open = False
+
+    def stats(self):
+        return {"connected": self.connected, "open": self.is_open, "opens": self.opens,
+                "pending": self.pending_open is not None, "missed": self.missed,
+                "coalesced": self.coalesced, "failures": self.failures, "reconnects": self.reconnects,
+                "queued": self.commands.qsize(), "latency": self.latency.snapshot()}
+
+
+# Stand-in for the Arduino on Linux: a pseudo-terminal whose slave end is the
+# "serial port" and whose master end records the bytes the controller sends.
+class FakeBarrierDevice:
+    def __init__(self):
+        import pty
+        self.master, self.slave = pty.openpty()
+        self.port = os.ttyname(self.slave)
+        self.received = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        import select
+        while not self.stop_event.is_set():
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master, 64)
+            except OSError:
+                return
+            for byte in data:
+                self.received.append((bytes([byte]), time.monotonic()))
+
+    def commands(self):
+        return b"".join(command for command, _ in self.received)
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join(timeout=1)
+        os.close(self.master)
+        os.close(self.slave)
+
+
+if __name__ == "__main__":
+    # Exercise the controller against the pty stand-in:  python barrier.py
+    device = FakeBarrierDevice()
+    controller = BarrierController(device.port, hold_seconds=0.5, settle_seconds=0).start()
+    for _ in range(3):
+        controller.open()
+    time.sleep(0.2)
+    controller.open()
+    time.sleep(1.0)
+    controller.open()
+    time.sleep(1.0)
+    controller.stop()
+    print("device received:", device.commands())
+    print(controller.stats())
+    device.close()
@@ -0,0 +1,100 @@
+# Detector backends on the gate footage: load time, first-frame latency with
+# and without warm-up, steady-state latency/fps per batch size, and how well
+# each backend's boxes agree with the PyTorch model.
+#
+#   python benchmarks/bench_detector.py gate_footage.mp4 --backends torch onnx openvino --batch 1 4
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from detection import detect_plates
+from detector import BACKENDS, load_detector, warm_up
+from pipeline import open_capture
+from tracker import iou
+
+
+def read_frames(source, limit):
+    capture = open_capture(source)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+# Share of reference boxes matched by a box with IoU >= 0.5
+def agreement(reference, boxes):
+    total = sum(len(frame_boxes) for frame_boxes in reference)
+    if not total:
+        return None
+    matched = sum(1 for ref, got in zip(reference, boxes) for box in ref if any(iou(box, b) >= 0.5 for b in got))
+    return matched / total
+
+
+def run(model, frames, batch):
+    latencies = []
+    boxes = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch):
+        t = time.perf_counter()
+        boxes.extend(detect_plates(model, frames[i:i + batch]))
+        latencies.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - start
+    return boxes, len(frames) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO detector backends")
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--int8", action="store_true", help="also run the quantised exports")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.frames)
+    if not frames:
+        sys.exit(f"No frames read from {args.source}")
+    variants = [(backend, False) for backend in args.backends]
+    if args.int8:
+        variants += [(backend, True) for backend in args.backends if backend != "torch"]
+
+    # Export first so load times below are for the cached artifacts
+    for backend, int8 in variants:
+        load_detector(args.weights, backend, int8=int8)
+
+    reference = None
+    print(f"{'backend':<14} {'load s':>7} {'cold ms':>8} {'warm-up s':>9} {'batch':>5} "
+          f"{'fps':>7} {'p50 ms':>7} {'p95 ms':>7} {'agree':>6}")
+    for backend, int8 in variants:
+        name = backend + ("-int8" if int8 else "")
+        start = time.perf_counter()
+        model = load_detector(args.weights, backend, int8=int8)
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        detect_plates(model, frames[:1])
+        cold = (time.perf_counter() - start) * 1000
+        # Fresh instance for the warm-up figure, the first one is already warm
+        model = load_detector(args.weights, backend, int8=int8)
+        warmed = warm_up(model, batch=max(args.batch))
+
+        for batch in args.batch:
+            boxes, fps, p50, p95 = run(model, frames, batch)
+            if reference is None:
+                reference = boxes
+            agree = agreement(reference, boxes)
+            print(f"{name:<14} {loaded:>7.2f} {cold:>8.1f} {warmed:>9.2f} {batch:>5} "
+                  f"{fps:>7.2f} {p50:>7.1f} {p95:>7.1f} {'-' if agree is None else f'{agree:.0%}':>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Frames/sec of the per-box readtext loop against the batched recognizer path.
+#
+#   python benchmarks/bench_ocr.py --plates 1 2 4 --frames 20
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from detection import read_plate, read_plates
+
+
+def per_box(reader, crops):
+    return [read_plate(reader, crop) for crop in crops]
+
+
+def batched(reader, crops):
+    return read_plates(reader, crops)
+
+
+def run(fn, reader, crops, frames):
+    fn(reader, crops)
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn(reader, crops)
+    elapsed = time.perf_counter() - start
+    return frames / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-box vs batched plate OCR")
+    parser.add_argument("--image", default="plate_images/cropped_plate.jpg")
+    parser.add_argument("--plates", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    import easyocr
+    reader = easyocr.Reader(['en'])
+    crop = cv2.imread(args.image)
+    if crop is None:
+        sys.exit(f"Could not read {args.image}")
+
+    print(f"{'plates':>6} {'per-box fps':>12} {'batched fps':>12} {'speedup':>8}")
+    for n in args.plates:
+        crops = [crop] * n
+        slow = run(per_box, reader, crops, args.frames)
+        fast = run(batched, reader, crops, args.frames)
+        print(f"{n:>6} {slow:>12.2f} {fast:>12.2f} {fast / slow:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# OCR throughput of the in-process reader on threads against the process pool
+# with 1..N workers, on the same plate crop, to check it scales with cores.
+#
+#   python benchmarks/bench_ocr_pool.py --workers 1 2 4 8 --plates 2 --calls 200
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from detection import read_plates
+from ocr_pool import OcrProcessPool, load_easyocr
+
+
+# Crops/sec with `threads` callers each reading `plates` crops per call, like the pipeline's OCR threads
+def run(read, crops, calls, threads):
+    read(crops)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda _: read(crops), range(calls)))
+    return calls * len(crops) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OCR process pool against threaded OCR")
+    parser.add_argument("--image", default="plate_images/cropped_plate.jpg")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--plates", type=int, default=2, help="crops per call")
+    parser.add_argument("--calls", type=int, default=100)
+    args = parser.parse_args()
+
+    crop = cv2.imread(args.image)
+    if crop is None:
+        sys.exit(f"Could not read {args.image}")
+    crops = [crop] * args.plates
+
+    reader = load_easyocr()
+    baseline = run(lambda c: read_plates(reader, c), crops, args.calls, 2 * max(args.workers))
+    print(f"{'mode':<12} {'crops/s':>9} {'speedup':>8}")
+    print(f"{'threads':<12} {baseline:>9.1f} {1.0:>7.2f}x")
+    for workers in args.workers:
+        start = time.perf_counter()
+        pool = OcrProcessPool(workers).start().wait_ready()
+        loaded = time.perf_counter() - start
+        try:
+            rate = run(pool.read, crops, args.calls, 2 * workers)
+        finally:
+            pool.stop()
+        print(f"{f'{workers} proc':<12} {rate:>9.1f} {rate / baseline:>7.2f}x   (workers ready in {loaded:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
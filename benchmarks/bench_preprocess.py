@@ -0,0 +1,80 @@
+# Time and allocations per crop of the old per-crop preprocess_image (plus the
+# resize read_plates used to do) against the buffered Preprocessor batch path.
+#
+#   python benchmarks/bench_preprocess.py --plates 1 4 --frames 200
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from detection import preprocess_image
+from preprocess import MODES, Preprocessor
+
+
+def legacy(crops, height=64):
+    strips = []
+    for crop in crops:
+        processed = preprocess_image(crop)
+        width = max(1, round(processed.shape[1] * height / processed.shape[0]))
+        strips.append(cv2.resize(processed, (width, height), interpolation=cv2.INTER_LINEAR))
+    return strips
+
+
+def measure(fn, crops, frames):
+    fn(crops)
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn(crops)
+    elapsed = time.perf_counter() - start
+    return elapsed / (frames * len(crops)) * 1e6
+
+
+# Peak bytes allocated above the warmed-up baseline while processing one frame;
+# tracemalloc sees NumPy and OpenCV output arrays
+def allocated(fn, crops):
+    fn(crops)
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    fn(crops)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (peak - baseline) / len(crops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plate preprocessing")
+    parser.add_argument("--image", default="plate_images/cropped_plate.jpg")
+    parser.add_argument("--plates", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    crop = cv2.imread(args.image)
+    if crop is None:
+        print(f"Could not read {args.image}, using a synthetic 60x220 crop")
+        crop = np.random.default_rng(0).integers(0, 255, (60, 220, 3), dtype=np.uint8)
+
+    candidates = [("legacy", legacy)]
+    for mode in MODES:
+        preprocessor = Preprocessor(mode)
+        candidates.append((mode, lambda crops, p=preprocessor: p.batch(crops)))
+    deskewing = Preprocessor("otsu", deskew=True)
+    candidates.append(("otsu+deskew", lambda crops: deskewing.batch(crops)))
+
+    print(f"{'plates':>6} {'variant':<12} {'us/crop':>8} {'KB allocated/crop':>18}")
+    for n in args.plates:
+        crops = [crop] * n
+        for name, fn in candidates:
+            micros = measure(fn, crops, args.frames)
+            kb = allocated(fn, crops) / 1024
+            print(f"{n:>6} {name:<12} {micros:>8.1f} {kb:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
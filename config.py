@@ -0,0 +1,67 @@
+# Gate configuration
+
+# Camera sources: device index, RTSP URL or video file. `roi` is the gate lane
+# polygon in frame pixels [(x, y), ...]; None uses the whole frame.
+CAMERAS = [
+    {"name": "entry", "source": 0, "roi": None},
+]
+
+# Fraction of ROI pixels that must change between frames to wake up YOLO
+MOTION_THRESHOLD = 0.005
+
+# End-to-end latency budget (frame captured -> plate read) the detection loop
+# adapts frame rate, YOLO input size and OCR frequency to; 0 disables it.
+# Cameras are sampled at ACTIVE_FPS while a vehicle is tracked, IDLE_FPS otherwise.
+LATENCY_BUDGET_MS = 500
+ACTIVE_FPS = 15
+IDLE_FPS = 5
+
+# Parking layout: number of slots on each level, numbered consecutively
+PARKING_LEVELS = [20]
+
+# Slot allocation policy: "lowest", "nearest", "random" or "type"
+SLOT_POLICY = "lowest"
+
+# Rows per page in the dashboard tables
+DASHBOARD_PAGE_SIZE = 50
+
+# Barrier Arduino: serial port (e.g. "COM6", "/dev/ttyUSB0" or "loop://" for a dry run)
+ARDUINO_PORT = "COM6"
+ARDUINO_BAUDRATE = 9600
+BARRIER_HOLD_SECONDS = 3
+
+# Plate-read cache in front of OCR: entries kept and their lifetime in seconds
+OCR_CACHE_SIZE = 512
+OCR_CACHE_TTL = 30.0
+
+# OCR worker processes (each loads its own EasyOCR reader); 0 keeps OCR on
+# threads in the main process
+OCR_PROCESSES = 0
+
+# Plate crop preprocessing before OCR: "otsu", "adaptive" (uneven/night light)
+# or "clahe" (low contrast); deskew straightens tilted plates
+PREPROCESS_MODE = "otsu"
+PREPROCESS_DESKEW = False
+
+# OCR reads that agree before a registered plate (after confusion correction
+# and edit-distance-1 lookup) is accepted; unknown plates need more votes
+KNOWN_PLATE_VOTES = 1
+
+# Plate detector: "torch" (best.pt as is), "onnx" (ONNX Runtime) or "openvino".
+# Exports are cached next to the weights; DETECTOR_INT8 quantises them.
+DETECTOR_WEIGHTS = "best.pt"
+DETECTOR_BACKEND = "torch"
+DETECTOR_INT8 = False
+
+# Metrics: JSON-lines snapshots and gate decisions in a size-rotated log, and a
+# local Prometheus /metrics + /profile endpoint for the desktop apps (None disables)
+METRICS_LOG = "detection_log.txt"
+METRICS_LOG_INTERVAL = 60.0
+METRICS_LOG_MAX_BYTES = 5 * 1024 * 1024
+METRICS_LOG_BACKUPS = 5
+METRICS_PORT = 9108
+
+# Bearer token the HTTP API requires for writes (POST/DELETE); with None only
+# clients on the gate machine itself may write. gate_server.py also reads it
+# from the GATE_API_TOKEN environment variable.
+API_TOKEN = None
@@ -0,0 +1,267 @@
+import math
+import queue
+import threading
+from datetime import datetime
+
+import cv2
+import ttkbootstrap as ttk
+
+from config import CAMERAS, METRICS_PORT
+from events import DENIED, ENTRY, EXIT, SLOT_CHANGED, VEHICLE_CHANGED, drain_on_tk
+from loader import watch_on_tk
+from metrics import METRICS, serve_metrics
+from pipeline import format_report
+
+
+# One page of a Treeview fed by a change stream. Only rows whose key changed are
+# re-read and updated in place; inserts and deletes reload just the current page.
+# Changes to keys on other pages are only counted: the page is reloaded when the
+# row count moved (an insert or delete), updates there are ignored.
+#
+# fetch_page(offset, limit) -> [(key, values)], fetch_row(key) -> values or None,
+# count() -> total rows. With numbered=True a running row number is prepended.
+# Flushes that apply changes are timed as dashboard_flush{table=name}.
+class PagedTable:
+    def __init__(self, tree, fetch_page, fetch_row, count, page_size=50, numbered=False, name="table"):
+        self.tree = tree
+        self.fetch_page = fetch_page
+        self.fetch_row = fetch_row
+        self.count = count
+        self.page_size = page_size
+        self.numbered = numbered
+        self.name = name
+        self.page = 0
+        self.total = 0
+        self.keys = []
+        self.label = None
+
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    # Called from any thread; the change is applied on the next flush()
+    def mark(self, key):
+        with self.lock:
+            self.pending.add(key)
+
+    def pages(self):
+        return max(1, math.ceil(self.total / self.page_size))
+
+    def _values(self, position, values):
+        return (self.page * self.page_size + position + 1,) + tuple(values) if self.numbered else tuple(values)
+
+    def reload(self):
+        self.total = self.count()
+        self.page = min(self.page, self.pages() - 1)
+        rows = self.fetch_page(self.page * self.page_size, self.page_size)
+        self.tree.delete(*self.tree.get_children())
+        self.keys = []
+        for position, (key, values) in enumerate(rows):
+            self.tree.insert("", "end", iid=str(key), values=self._values(position, values))
+            self.keys.append(key)
+        self._update_label()
+
+    def flush(self):
+        with self.lock:
+            changed, self.pending = self.pending, set()
+        if not changed:
+            return
+        with METRICS.timer("dashboard_flush", table=self.name):
+            self._apply(changed)
+
+    def _apply(self, changed):
+        needs_reload = False
+        off_page = False
+        for key in changed:
+            iid = str(key)
+            if not self.tree.exists(iid):
+                off_page = True
+                continue
+            values = self.fetch_row(key)
+            if values is None:
+                needs_reload = True
+            else:
+                self.tree.item(iid, values=self._values(self.keys.index(key), values))
+        if off_page and not needs_reload and self.count() != self.total:
+            needs_reload = True
+        if needs_reload:
+            self.reload()
+        else:
+            self._update_label()
+
+    def go(self, step):
+        self.page = max(0, min(self.page + step, self.pages() - 1))
+        self.reload()
+
+    def pager(self, parent):
+        frame = ttk.Frame(parent)
+        ttk.Button(frame, text="◀", bootstyle="secondary, outline", width=3,
+                   command=lambda: self.go(-1)).pack(side="left")
+        self.label = ttk.Label(frame, text="")
+        self.label.pack(side="left", padx=10)
+        ttk.Button(frame, text="▶", bootstyle="secondary, outline", width=3,
+                   command=lambda: self.go(1)).pack(side="left")
+        return frame
+
+    def _update_label(self):
+        if self.label is not None:
+            self.label.configure(text=f"Page {self.page + 1}/{self.pages()}  ({self.total} rows)")
+
+
+def vehicle_view(tree, repo, page_size=50):
+    return PagedTable(
+        tree,
+        lambda offset, limit: [(v.number_plate, (v.number_plate, v.owner_name, v.vehicle_type))
+                               for v in repo.vehicle_page(offset, limit)],
+        lambda plate: _vehicle_values(repo.get_vehicle(plate)),
+        repo.count_vehicles,
+        page_size,
+        numbered=True,
+        name="vehicles",
+    )
+
+
+def slot_view(tree, repo, page_size=50):
+    return PagedTable(
+        tree,
+        lambda offset, limit: [(s.slot_number, _slot_values(s)) for s in repo.slot_page(offset, limit)],
+        lambda slot_number: _slot_values(repo.get_slot_row(slot_number)),
+        repo.count_slots,
+        page_size,
+        name="slots",
+    )
+
+
+def _vehicle_values(vehicle):
+    return (vehicle.number_plate, vehicle.owner_name, vehicle.vehicle_type) if vehicle else None
+
+
+def _slot_values(slot):
+    if slot is None:
+        return None
+    return slot.slot_number, slot.number_plate or "-", (slot.owner_name or "-") if slot.number_plate else "-"
+
+
+# Apply slot/vehicle change events from the bus on the Tk thread. If the
+# subscription ever overflows, fall back to one full reload of both pages.
+def connect(root, bus, vehicles, slots, interval_ms=200):
+    subscription = bus.subscribe([SLOT_CHANGED, VEHICLE_CHANGED], maxsize=10000)
+    seen_dropped = [0]
+
+    def poll():
+        for event in subscription.drain():
+            if event.kind == SLOT_CHANGED:
+                slots.mark(event.slot)
+            else:
+                vehicles.mark(event.plate)
+        if subscription.dropped != seen_dropped[0]:
+            seen_dropped[0] = subscription.dropped
+            vehicles.reload()
+            slots.reload()
+        vehicles.flush()
+        slots.flush()
+        root.after(interval_ms, poll)
+
+    root.after(interval_ms, poll)
+
+
+# What the Tk dashboards (main.py, main2.py) share once each has laid out its
+# widgets: the live detection window, the status line, model-loading progress
+# and the startup wiring. Buttons call the bound methods, e.g.
+# command=lambda: app.live_detection().
+class GateDashboard:
+    def __init__(self, root, service, startup, status_label, loading_bar, start_button, vehicles, slots):
+        self.root = root
+        self.service = service
+        self.startup = startup
+        self.status_label = status_label
+        self.loading_bar = loading_bar
+        self.start_button = start_button
+        self.vehicles = vehicles
+        self.slots = slots
+
+    def run_detection(self):
+        # Capture, YOLO, OCR and the gate run on the service's threads; this loop only draws
+        service = self.service
+        pipeline = service.start_detection(CAMERAS[:1])
+
+        while service.detecting():
+            try:
+                result = service.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            if result.plates:
+                self.startup.mark("first_detection")
+            frame = result.image
+            for plate in result.plates:
+                if not plate.text:
+                    continue
+                x1, y1, x2, y2 = plate.box
+
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(frame, plate.text, (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+
+            cv2.putText(frame, format_report(pipeline.report()), (10, 25),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            cv2.imshow("Live Vehicle Entry", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+        service.stop_detection()
+        cv2.destroyAllWindows()
+
+    # Off the Tk thread, so the dashboard keeps applying events while detection runs
+    def live_detection(self):
+        thread = threading.Thread(target=self.run_detection)
+        thread.daemon = True
+        thread.start()
+
+    # Full reload of the visible pages; live updates arrive through the repository change stream
+    def refresh_tables(self):
+        with METRICS.timer("refresh_tables"):
+            self.vehicles.reload()
+            self.slots.reload()
+
+    def show_event(self, event):
+        if event.kind == ENTRY:
+            text, style = f"Access Granted — Vehicle: {event.plate} | Owner: {event.owner} | Slot: {event.slot}", "success"
+        elif event.kind == EXIT:
+            text, style = f"Exit Recorded — Vehicle: {event.plate} | Slot {event.slot} is now free", "info"
+        elif event.detail == "full":
+            text, style = f"Parking Full — Vehicle: {event.plate} | Owner: {event.owner}", "warning"
+        else:
+            text, style = f"Access Denied — Vehicle: {event.plate} ({event.detail})", "danger"
+        self.status_label.configure(text=f"{datetime.fromtimestamp(event.timestamp):%H:%M:%S}  {text}", bootstyle=style)
+
+    def show_loading(self, status):
+        self.loading_bar.configure(value=status["done"])
+        if status["step"]:
+            self.status_label.configure(text=f"Loading {status['step']} ({status['done'] + 1}/{status['total']})...")
+
+    def models_ready(self):
+        self.startup.mark("models_ready")
+        self.loading_bar.pack_forget()
+        self.start_button.configure(text="Start Live Detection", state="normal")
+        self.status_label.configure(text=f"Waiting for vehicles...  ({self.startup.report()})")
+
+    def models_failed(self, message):
+        self.loading_bar.configure(bootstyle="danger")
+        self.status_label.configure(text=f"Model loading failed — {message}", bootstyle="danger")
+
+    # Starts the service, runs the Tk main loop and stops the service once the window closes
+    def run(self):
+        root, service = self.root, self.service
+        self.refresh_tables()
+        root.after(0, lambda: self.startup.mark("first_window"))
+        service.start()
+        if METRICS_PORT:
+            try:
+                serve_metrics("127.0.0.1", METRICS_PORT)
+            except OSError as e:
+                print(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
+        watch_on_tk(root, service.models, self.show_loading, self.models_ready, self.models_failed)
+        connect(root, service.bus, self.vehicles, self.slots)
+        drain_on_tk(root, service.bus.subscribe([ENTRY, EXIT, DENIED]), self.show_event)
+        root.mainloop()
+        service.stop()
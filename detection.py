@@ -0,0 +1,70 @@
+import time
+
+import cv2
+
+from metrics import METRICS
+from plates import clean_plate_text, is_valid_plate
+from preprocess import Preprocessor
+
+
+DEFAULT_PREPROCESSOR = Preprocessor()
+
+
+# Preprocessing of a single crop at its own size (used by read_plate)
+def preprocess_image(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (3, 3), 0)
+    _, thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+
+# YOLO boxes for a batch of frames, one list of integer (x1, y1, x2, y2) tuples per frame
+# imgsz overrides the model's input size (multiple of 32) to trade accuracy for speed
+def detect_plates(model, frames, imgsz=None):
+    options = {"imgsz": imgsz} if imgsz else {}
+    return [[tuple(map(int, box.xyxy[0])) for box in r.boxes]
+            for r in model(list(frames), verbose=False, **options)]
+
+
+def crop_box(frame, box):
+    x1, y1, x2, y2 = box
+    return frame[max(y1, 0):max(y2, 0), max(x1, 0):max(x2, 0)]
+
+
+# OCR a single plate crop, returns (text, confidence) or None
+def read_plate(reader, cropped):
+    if cropped.size == 0:
+        return None
+    processed_img = preprocess_image(cropped)
+    ocr_result = reader.readtext(processed_img)
+    if not ocr_result:
+        return None
+    _, plate_text, confidence = ocr_result[0]
+    return clean_plate_text(plate_text), float(confidence)
+
+
+# OCR every plate crop of a frame in one recognizer call. The YOLO crop already
+# is the plate, so EasyOCR's text detector is skipped: the preprocessor lays the
+# crops side by side at a common height and they go to the recognizer as boxes.
+# on_timing(stage, seconds) optionally receives the preprocess/recognize split.
+def read_plates(reader, crops, preprocessor=None, gap=8, on_timing=None):
+    start = time.perf_counter()
+    reads = [None] * len(crops)
+    canvas, boxes, index = (preprocessor or DEFAULT_PREPROCESSOR).batch(crops, gap)
+    if not boxes:
+        return reads
+
+    prepared = time.perf_counter()
+    ocr_result = reader.recognize(canvas, horizontal_list=boxes, free_list=[], batch_size=len(boxes))
+    recognized = time.perf_counter()
+    METRICS.observe("preprocess", prepared - start)
+    METRICS.observe("recognize", recognized - prepared)
+    if on_timing:
+        on_timing("preprocess", prepared - start)
+        on_timing("recognize", recognized - prepared)
+    starts = [b[0] for b in boxes]
+    for box, plate_text, confidence in ocr_result:
+        x_min = int(box[0][0])
+        nearest = min(range(len(starts)), key=lambda k: abs(starts[k] - x_min))
+        reads[index[nearest]] = (clean_plate_text(plate_text), float(confidence))
+    return reads
@@ -0,0 +1,63 @@
+import os
+import shutil
+import time
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+def _fresh(artifact, weights):
+    return os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(weights)
+
+
+# Exported model for a backend, built once and cached next to the weights
+# (best.onnx, best.int8.onnx, best_openvino_model/). Re-exported whenever the
+# .pt file is newer than the cached artifact.
+def export_weights(weights, backend, imgsz=640, int8=False):
+    from ultralytics import YOLO
+
+    stem = os.path.splitext(weights)[0]
+    if backend == "onnx":
+        onnx_path = stem + ".onnx"
+        if not _fresh(onnx_path, weights):
+            # dynamic axes keep batched inference over several cameras working
+            onnx_path = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        if not int8:
+            return onnx_path
+        int8_path = stem + ".int8.onnx"
+        if not _fresh(int8_path, weights):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+    if backend == "openvino":
+        folder = stem + ("_int8" if int8 else "") + "_openvino_model"
+        if not _fresh(folder, weights):
+            exported = YOLO(weights).export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8)
+            if os.path.abspath(exported) != os.path.abspath(folder):
+                shutil.rmtree(folder, ignore_errors=True)
+                os.replace(exported, folder)
+        return folder
+    raise ValueError(f"Unknown detector backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+# YOLO plate detector on the chosen backend. Every backend is loaded through
+# ultralytics, so model(frames, verbose=False) and detect_plates() behave the
+# same whichever one runs underneath.
+def load_detector(weights="best.pt", backend="torch", imgsz=640, int8=False):
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(weights)
+    return YOLO(export_weights(weights, backend, imgsz, int8), task="detect")
+
+
+# Run a few dummy frames so graph optimisation, allocator growth and lazy
+# initialisation happen before the camera opens instead of on the first car.
+# Returns the seconds spent.
+def warm_up(model, imgsz=640, runs=2, batch=1):
+    start = time.perf_counter()
+    blank = np.zeros((imgsz, imgsz, 3), np.uint8)
+    for _ in range(runs):
+        model([blank] * batch, verbose=False)
+    return time.perf_counter() - start
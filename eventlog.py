@@ -0,0 +1,227 @@
+# Append-only audit trail of gate decisions in the `events` table, plus the
+# occupancy/dwell/peak-hour queries and CSV/Parquet export built on it.
+#
+#   python eventlog.py report
+#   python eventlog.py export events.csv --since 2024-01-01
+import argparse
+import csv
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from events import DENIED, ENTRY, EXIT
+
+EventRow = namedtuple("EventRow", "ts plate gate slot confidence decision")
+Dwell = namedtuple("Dwell", "plate entered left seconds")
+
+INSERT_EVENT = "INSERT INTO events (ts, plate, gate, slot, confidence, decision) VALUES (?, ?, ?, ?, ?, ?)"
+SELECT_EVENTS = ("SELECT ts, plate, gate, slot, confidence, decision FROM events "
+                 "WHERE ts >= ? AND ts < ? ORDER BY ts")
+OCCUPANCY_BEFORE = ("SELECT COALESCE(SUM(CASE decision WHEN 'entry' THEN 1 ELSE -1 END), 0) FROM events "
+                    "WHERE decision IN ('entry', 'exit') AND ts < ?")
+OCCUPANCY_DELTAS = ("SELECT CAST(ts / ? AS INTEGER) AS bucket, "
+                    "SUM(CASE decision WHEN 'entry' THEN 1 ELSE -1 END) FROM events "
+                    "WHERE decision IN ('entry', 'exit') AND ts >= ? AND ts < ? GROUP BY bucket ORDER BY bucket")
+# Each entry paired with the same plate's next event, kept when that is an exit
+DWELL = ("SELECT plate, ts, next_ts, next_ts - ts FROM ("
+         "  SELECT plate, ts, decision, LEAD(ts) OVER w AS next_ts, LEAD(decision) OVER w AS next_decision"
+         "  FROM events WHERE decision IN ('entry', 'exit') AND (?1 IS NULL OR plate = ?1)"
+         "  WINDOW w AS (PARTITION BY plate ORDER BY ts)"
+         ") WHERE decision = 'entry' AND next_decision = 'exit' AND ts >= ?2 ORDER BY ts")
+PEAK_HOURS = ("SELECT CAST(strftime('%H', ts, 'unixepoch', 'localtime') AS INTEGER) AS hour, COUNT(*) AS entries "
+              "FROM events WHERE decision = 'entry' AND ts >= ? GROUP BY hour ORDER BY entries DESC, hour")
+
+EXPORT_COLUMNS = ("time",) + EventRow._fields
+
+
+# Writes gate events off the decision path: events queue up in a bus
+# subscription and a background thread inserts whatever arrived every
+# flush_ms in a single transaction. A failed insert (database locked or busy)
+# keeps its rows, up to maxsize, and they go out with the next flush.
+class EventLog:
+    def __init__(self, repo, flush_ms=250, maxsize=100000):
+        self.repo = repo
+        self.flush_ms = flush_ms
+        self.maxsize = maxsize
+        self.subscription = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.pending = []
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.lost = 0
+        self.last_error = None
+
+    def attach(self, bus):
+        self.subscription = bus.subscribe([ENTRY, EXIT, DENIED], maxsize=self.maxsize)
+        return self
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+        self.flush()
+
+    def flush(self):
+        if self.subscription is None:
+            return 0
+        rows = self.pending + [(event.timestamp, event.plate, event.camera, event.slot, event.confidence,
+                                event.detail or event.kind) for event in self.subscription.drain()]
+        self.pending = []
+        if not rows:
+            return 0
+        try:
+            with self.repo.pool.transaction() as conn:
+                conn.executemany(INSERT_EVENT, rows)
+        except sqlite3.Error as e:
+            if self.last_error is None:
+                print(f"event log: write failed, retrying: {e}", file=sys.stderr)
+            self.failures += 1
+            self.last_error = str(e)
+            self.lost += max(0, len(rows) - self.maxsize)
+            self.pending = rows[-self.maxsize:]
+            return 0
+        if self.last_error is not None:
+            print("event log: write recovered", file=sys.stderr)
+            self.last_error = None
+        self.written += len(rows)
+        self.batches += 1
+        return len(rows)
+
+    def _run(self):
+        while not self.stop_event.wait(self.flush_ms / 1000):
+            self.flush()
+
+    def stats(self):
+        return {"written": self.written, "batches": self.batches, "pending": len(self.pending),
+                "failures": self.failures, "lost": self.lost,
+                "dropped": self.subscription.dropped if self.subscription else 0}
+
+
+def _range(since=None, until=None):
+    return (since or 0.0), (until or float("inf"))
+
+
+def iter_events(repo, since=None, until=None, chunk=1000):
+    with repo.pool.connection() as conn:
+        cursor = conn.execute(SELECT_EVENTS, _range(since, until))
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                return
+            for row in rows:
+                yield EventRow(*row)
+
+
+# [(bucket_start, cars_parked_at_bucket_end)] for buckets with entries or exits
+def occupancy_over_time(repo, since=None, until=None, bucket_seconds=3600):
+    start, end = _range(since, until)
+    with repo.pool.connection() as conn:
+        parked = conn.execute(OCCUPANCY_BEFORE, (start,)).fetchone()[0]
+        deltas = conn.execute(OCCUPANCY_DELTAS, (bucket_seconds, start, end)).fetchall()
+    series = []
+    for bucket, delta in deltas:
+        parked += delta
+        series.append((bucket * bucket_seconds, parked))
+    return series
+
+
+def dwell_times(repo, plate=None, since=None):
+    with repo.pool.connection() as conn:
+        return [Dwell(*row) for row in conn.execute(DWELL, (plate, since or 0.0))]
+
+
+# [(hour_of_day, entries)], busiest first
+def peak_hours(repo, since=None):
+    with repo.pool.connection() as conn:
+        return conn.execute(PEAK_HOURS, (since or 0.0,)).fetchall()
+
+
+def _export_row(row):
+    return (datetime.fromtimestamp(row.ts).isoformat(timespec="seconds"),) + tuple(row)
+
+
+def export_csv(repo, path, since=None, until=None):
+    count = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in iter_events(repo, since, until):
+            writer.writerow(_export_row(row))
+            count += 1
+    return count
+
+
+def export_parquet(repo, path, since=None, until=None, chunk=10000):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = pa.schema([("time", pa.string()), ("ts", pa.float64()), ("plate", pa.string()),
+                        ("gate", pa.string()), ("slot", pa.int64()), ("confidence", pa.float64()),
+                        ("decision", pa.string())])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in iter_events(repo, since, until, chunk):
+            batch.append(_export_row(row))
+            if len(batch) == chunk:
+                writer.write_table(pa.Table.from_arrays([list(column) for column in zip(*batch)], schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_arrays([list(column) for column in zip(*batch)], schema=schema))
+            count += len(batch)
+    return count
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main():
+    from repository import default_repository
+
+    parser = argparse.ArgumentParser(description="Query or export the gate event log")
+    parser.add_argument("command", choices=["report", "export"])
+    parser.add_argument("path", nargs="?", help="export file, .csv or .parquet")
+    parser.add_argument("--since", help="ISO date/time")
+    parser.add_argument("--until", help="ISO date/time")
+    args = parser.parse_args()
+
+    repo = default_repository()
+    # A database the gate has not run on yet simply has no events
+    repo.ensure_event_table()
+    since, until = _timestamp(args.since), _timestamp(args.until)
+    if args.command == "export":
+        if not args.path:
+            parser.error("export needs a path")
+        export = export_parquet if args.path.endswith(".parquet") else export_csv
+        start = time.perf_counter()
+        count = export(repo, args.path, since, until)
+        print(f"{count} events written to {args.path} in {time.perf_counter() - start:.2f}s")
+        return
+
+    print("Peak hours (entries):")
+    for hour, entries in peak_hours(repo, since)[:5]:
+        print(f"  {hour:02d}:00  {entries}")
+    dwells = dwell_times(repo, since=since)
+    if dwells:
+        average = sum(d.seconds for d in dwells) / len(dwells)
+        print(f"Visits: {len(dwells)}, average dwell {average / 60:.1f} min")
+    series = occupancy_over_time(repo, since, until)
+    if series:
+        busiest = max(series, key=lambda point: point[1])
+        print(f"Max occupancy {busiest[1]} at {datetime.fromtimestamp(busiest[0]):%Y-%m-%d %H:00}")
+
+
+if __name__ == "__main__":
+    main()
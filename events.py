@@ -0,0 +1,92 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+
+ENTRY = "entry"
+EXIT = "exit"
+DENIED = "denied"
+SLOT_CHANGED = "slot_changed"
+VEHICLE_CHANGED = "vehicle_changed"
+
+GateEvent = namedtuple("GateEvent", "kind plate owner slot camera confidence detail timestamp")
+
+
+def gate_event(kind, plate=None, owner=None, slot=None, camera=None, confidence=None, detail=None):
+    return GateEvent(kind, plate, owner, slot, camera, confidence, detail, time.time())
+
+
+class Subscription:
+    def __init__(self, kinds, maxsize):
+        self.kinds = set(kinds) if kinds else None
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, event):
+        if self.kinds is not None and event.kind not in self.kinds:
+            return
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                # A stalled consumer loses its oldest events, never blocks the publisher
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+
+# Thread-safe fan-out of gate events. publish() never blocks, so the detection
+# loop can hand off UI and hardware work without waiting on either.
+class EventBus:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = []
+
+    def subscribe(self, kinds=None, maxsize=1000):
+        subscription = Subscription(kinds, maxsize)
+        with self.lock:
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+
+    def publish(self, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(event)
+
+    # Forward repository writes as slot/vehicle change events
+    def attach(self, repo):
+        def on_change(kind, key):
+            if kind == "slot":
+                self.publish(gate_event(SLOT_CHANGED, slot=key))
+            else:
+                self.publish(gate_event(VEHICLE_CHANGED, plate=key))
+        repo.subscribe(on_change)
+
+
+# Drain a subscription on the Tk thread with root.after polling
+def drain_on_tk(root, subscription, handler, interval_ms=100):
+    def poll():
+        for event in subscription.drain():
+            handler(event)
+        root.after(interval_ms, poll)
+    root.after(interval_ms, poll)
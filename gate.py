@@ -0,0 +1,70 @@
+import queue
+import threading
+
+from authcache import AuthCache
+from events import DENIED, ENTRY, EXIT, gate_event
+from metrics import METRICS
+from repository import default_repository
+
+
+# Entry/exit decision for a confirmed plate, shared by the GUI and the gate server.
+# Returns (decision, owner, slot) where decision is "entry", "exit", "full",
+# "unknown" for unregistered plates or "blocked" when a vehicle with allowed = 0
+# tries to enter (it can still leave).
+# With a cache, the lookups are answered from memory instead of SQLite.
+def process_plate(plate_text_clean, repo=None, cache=None):
+    repo = repo or default_repository()
+    vehicle = cache.vehicle(plate_text_clean) if cache else repo.get_vehicle(plate_text_clean)
+    if not vehicle:
+        return "unknown", None, None
+
+    slot = cache.assigned_slot(plate_text_clean) if cache else repo.get_assigned_slot(plate_text_clean)
+    if not slot:
+        if not vehicle.allowed:
+            return "blocked", vehicle.owner_name, None
+        slot = repo.assign_next_available_slot(plate_text_clean, vehicle.vehicle_type)
+        return ("entry" if slot else "full"), vehicle.owner_name, slot
+
+    repo.release_slot(slot)
+    return "exit", vehicle.owner_name, slot
+
+
+# Runs process_plate for confirmed plates on its own thread and publishes the
+# outcome, so the detection loop never waits on SQLite. Authorization and
+# occupancy come from an AuthCache kept in sync with the database.
+class GateWorker:
+    def __init__(self, repo, bus, cache=None):
+        self.repo = repo
+        self.bus = bus
+        self.cache = cache or AuthCache(repo)
+        self.plates = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if not self.cache.thread.is_alive():
+            self.cache.start()
+        self.thread.start()
+        return self
+
+    def submit(self, plate_text_clean, camera=None, confidence=None):
+        self.plates.put((plate_text_clean, camera, confidence))
+
+    def stop(self):
+        self.plates.put(None)
+        self.thread.join(timeout=2)
+        self.cache.stop()
+
+    def _run(self):
+        while True:
+            item = self.plates.get()
+            if item is None:
+                return
+            plate_text_clean, camera, confidence = item
+            with METRICS.timer("gate_decision"):
+                decision, owner, slot = process_plate(plate_text_clean, self.repo, self.cache)
+            METRICS.inc("decisions", decision=decision)
+            if decision in (ENTRY, EXIT):
+                kind, detail = decision, None
+            else:
+                kind, detail = DENIED, decision
+            self.bus.publish(gate_event(kind, plate_text_clean, owner, slot, camera, confidence, detail))
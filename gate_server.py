@@ -0,0 +1,124 @@
+# Headless gate service: one YOLO model and one OCR reader shared by every
+# camera. Sources can be device indices, RTSP URLs or video files.
+#
+#   python gate_server.py --source 0 --source rtsp://10.0.0.12/stream1 --http 0.0.0.0:8080
+#   kill -USR1 <pid>    writes a 10 s sampling profile to profile-<time>.folded
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+from api import GateApi, parse_address
+from barrier import BarrierController
+from config import (API_TOKEN, ARDUINO_BAUDRATE, BARRIER_HOLD_SECONDS, CAMERAS, DETECTOR_BACKEND, DETECTOR_INT8,
+                    DETECTOR_WEIGHTS, LATENCY_BUDGET_MS, OCR_PROCESSES, PREPROCESS_DESKEW,
+                    PREPROCESS_MODE)
+from detector import BACKENDS
+from events import DENIED, ENTRY, EXIT
+from metrics import serve_metrics, write_profile
+from preprocess import MODES, Preprocessor
+from service import GateService, model_loader
+
+
+def parse_source(source):
+    return int(source) if source.isdigit() else source
+
+
+def camera_configs(sources):
+    if not sources:
+        return CAMERAS
+    return [{"name": f"cam{i}", "source": parse_source(source), "roi": None} for i, source in enumerate(sources)]
+
+
+def print_event(event):
+    print(f"[{event.camera}] {event.plate} ({event.confidence:.2f}) -> {event.detail or event.kind}"
+          + (f", owner {event.owner}" if event.owner else "")
+          + (f", slot {event.slot}" if event.slot else ""))
+
+
+def profile_on_signal(signum, frame):
+    def dump():
+        print(f"Profile written to {write_profile()}")
+    threading.Thread(target=dump, daemon=True).start()
+
+
+async def run(service, decisions, http, stats_interval, token=None):
+    api = None
+    if http:
+        host, port = parse_address(http)
+        api = await GateApi(service, host, port, token=token).start()
+        print(f"API listening on http://{host}:{port} (WebSocket at /ws)")
+    last_stats = time.monotonic()
+    try:
+        while service.detecting():
+            for event in decisions.drain():
+                print_event(event)
+            if time.monotonic() - last_stats >= stats_interval:
+                last_stats = time.monotonic()
+                print(json.dumps(service.report(), indent=2))
+            await asyncio.sleep(0.2)
+    finally:
+        if api:
+            api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the gates headless on one shared model")
+    parser.add_argument("--source", action="append", default=[],
+                        help="camera index, RTSP URL or video file (repeatable, default: config.CAMERAS)")
+    parser.add_argument("--weights", default=DETECTOR_WEIGHTS)
+    parser.add_argument("--backend", choices=BACKENDS, default=DETECTOR_BACKEND)
+    parser.add_argument("--int8", action="store_true", default=DETECTOR_INT8, help="use the quantised export")
+    parser.add_argument("--ocr-workers", type=int, default=2, help="OCR threads")
+    parser.add_argument("--ocr-processes", type=int, default=OCR_PROCESSES,
+                        help="OCR worker processes, one EasyOCR reader each (0: OCR on threads)")
+    parser.add_argument("--max-batch", type=int, default=4)
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    parser.add_argument("--preprocess", choices=MODES, default=PREPROCESS_MODE)
+    parser.add_argument("--deskew", action="store_true", default=PREPROCESS_DESKEW)
+    parser.add_argument("--latency-budget", type=float, default=LATENCY_BUDGET_MS, metavar="MS",
+                        help="end-to-end latency target the detection loop adapts to (0: process every frame)")
+    parser.add_argument("--http", metavar="HOST:PORT", help="serve the REST/WebSocket API, e.g. 0.0.0.0:8080")
+    parser.add_argument("--api-token", default=os.environ.get("GATE_API_TOKEN", API_TOKEN),
+                        help="bearer token for API writes (default: $GATE_API_TOKEN; none: local writes only)")
+    parser.add_argument("--barrier", metavar="PORT", help="serial port of the barrier Arduino (default: none)")
+    parser.add_argument("--metrics", metavar="HOST:PORT",
+                        help="serve only /metrics and /profile (they are also on the --http API)")
+    args = parser.parse_args()
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, profile_on_signal)
+    if args.metrics:
+        serve_metrics(*parse_address(args.metrics))
+
+    barrier = (BarrierController(args.barrier, ARDUINO_BAUDRATE, hold_seconds=BARRIER_HOLD_SECONDS)
+               if args.barrier else None)
+    preprocessor = Preprocessor(args.preprocess, args.deskew)
+    service = GateService(barrier=barrier,
+                          models=model_loader(args.weights, args.backend, args.int8, args.ocr_processes, preprocessor),
+                          preprocessor=preprocessor,
+                          ocr_workers=args.ocr_workers, max_batch=args.max_batch,
+                          latency_budget_ms=args.latency_budget).start()
+    decisions = service.bus.subscribe([ENTRY, EXIT, DENIED])
+
+    try:
+        while not service.models.ready.wait(0.5):
+            if service.models.error:
+                sys.exit(f"Model loading failed: {service.models.error}")
+        pipeline = service.start_detection(camera_configs(args.source))
+        print(f"Serving {len(pipeline.cameras)} camera(s): " + ", ".join(camera.name for camera in pipeline.cameras))
+        asyncio.run(run(service, decisions, args.http, args.stats_interval, args.api_token))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        for event in decisions.drain():
+            print_event(event)
+
+
+if __name__ == "__main__":
+    main()
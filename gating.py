@@ -0,0 +1,85 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+# Cheap motion check inside the gate lane ROI so YOLO only runs when something
+# moves there, and only on the ROI crop. mode is "diff" (frame differencing)
+# or "mog2" (background subtraction).
+class MotionGate:
+    def __init__(self, roi=None, threshold=0.005, scale=0.25, mode="diff", pixel_delta=25):
+        self.roi = np.array(roi, np.int32) if roi else None
+        self.threshold = threshold
+        self.scale = scale
+        self.mode = mode
+        self.pixel_delta = pixel_delta
+        self.previous = None
+        self.mask = None
+        self.mask_area = 1
+        self.rect = None
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=300, detectShadows=False) if mode == "mog2" else None
+
+        self.lock = threading.Lock()
+        self.frames_seen = 0
+        self.frames_skipped = 0
+        self.pixels_total = 0
+        self.pixels_inferred = 0
+
+    def _setup(self, frame):
+        h, w = frame.shape[:2]
+        if self.roi is None:
+            self.rect = (0, 0, w, h)
+        else:
+            x, y, rw, rh = cv2.boundingRect(self.roi)
+            x, y = max(x, 0), max(y, 0)
+            self.rect = (x, y, min(x + rw, w), min(y + rh, h))
+        x1, y1, x2, y2 = self.rect
+        small = (max(1, int((x2 - x1) * self.scale)), max(1, int((y2 - y1) * self.scale)))
+        mask = np.zeros((y2 - y1, x2 - x1), np.uint8)
+        if self.roi is None:
+            mask[:] = 255
+        else:
+            cv2.fillPoly(mask, [self.roi - np.array([x1, y1], np.int32)], 255)
+        self.mask = cv2.resize(mask, small, interpolation=cv2.INTER_NEAREST)
+        self.mask_area = max(1, cv2.countNonZero(self.mask))
+
+    def crop(self, frame):
+        if self.rect is None:
+            self._setup(frame)
+        x1, y1, x2, y2 = self.rect
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def has_motion(self, frame):
+        roi, _ = self.crop(frame)
+        small = cv2.resize(roi, (self.mask.shape[1], self.mask.shape[0]), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.subtractor is not None:
+            changed = self.subtractor.apply(gray)
+        else:
+            if self.previous is None:
+                self.previous = gray
+                return True
+            changed = cv2.absdiff(gray, self.previous)
+            self.previous = gray
+            _, changed = cv2.threshold(changed, self.pixel_delta, 255, cv2.THRESH_BINARY)
+        moving = cv2.countNonZero(cv2.bitwise_and(changed, self.mask))
+        return moving / self.mask_area >= self.threshold
+
+    def record(self, frame, inferred):
+        h, w = frame.shape[:2]
+        with self.lock:
+            self.frames_seen += 1
+            self.pixels_total += h * w
+            if inferred:
+                x1, y1, x2, y2 = self.rect
+                self.pixels_inferred += (x2 - x1) * (y2 - y1)
+            else:
+                self.frames_skipped += 1
+
+    def stats(self):
+        with self.lock:
+            saved = 1 - self.pixels_inferred / self.pixels_total if self.pixels_total else 0.0
+            return {"frames_seen": self.frames_seen, "frames_skipped": self.frames_skipped,
+                    "compute_saved": saved}
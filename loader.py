@@ -0,0 +1,85 @@
+import threading
+import time
+
+
+# Named startup milestones, in seconds since the timer was created (at the
+# top of the entry script). Each milestone is recorded once.
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    def mark(self, name):
+        with self.lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = time.perf_counter() - self.start
+        print(f"startup: {name.replace('_', ' ')} after {self.marks[name]:.2f}s")
+        return True
+
+    def report(self):
+        with self.lock:
+            return ", ".join(f"{name.replace('_', ' ')} {seconds:.1f}s" for name, seconds in self.marks.items())
+
+
+# Runs slow initialisation steps (model loading, warm-up) one after another on
+# a daemon thread so the GUI can come up first. steps are (name, fn) pairs;
+# fn(results) gets the results of the earlier steps and its return value is
+# stored under name.
+class BackgroundLoader:
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.results = {}
+        self.timings = {}
+        self.current = None
+        self.done = 0
+        self.error = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        for name, fn in self.steps:
+            self.current = name
+            start = time.perf_counter()
+            try:
+                self.results[name] = fn(self.results)
+            except Exception as e:
+                self.error = f"{name}: {e}"
+                return
+            self.timings[name] = time.perf_counter() - start
+            self.done += 1
+        self.current = None
+        self.ready.set()
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def status(self):
+        return {"step": self.current, "done": self.done, "total": len(self.steps),
+                "ready": self.ready.is_set(), "error": self.error, "timings": dict(self.timings)}
+
+
+# Poll a loader from the Tk thread: on_progress(status) on every change, then
+# on_ready() or on_error(message) once.
+def watch_on_tk(root, loader, on_progress, on_ready, on_error, interval_ms=100):
+    seen = [None]
+
+    def poll():
+        status = loader.status()
+        key = (status["step"], status["done"])
+        if key != seen[0]:
+            seen[0] = key
+            on_progress(status)
+        if status["error"]:
+            on_error(status["error"])
+        elif status["ready"]:
+            on_ready()
+        else:
+            root.after(interval_ms, poll)
+
+    root.after(interval_ms, poll)
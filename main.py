@@ -1,149 +1,21 @@
-import cv2
-from ultralytics import YOLO
-import easyocr
-import sqlite3
-import time
-import threading
-from datetime import datetime
-import numpy as np
-import ttkbootstrap as ttk
-from tkinter import messagebox, ttk as tkttk
-import re
-import serial
-
-try:
-    arduino = serial.Serial('COM6', 9600)
-    time.sleep(2)
-except:
-    arduino = None
-    print("⚠️ Could not connect to Arduino")
-
-model = YOLO("best.pt")
-reader = easyocr.Reader(['en'])
-
-conn = sqlite3.connect("vehicles.db")
-cursor = conn.cursor()
-cursor.execute("""CREATE TABLE IF NOT EXISTS parking_slots (
-                    slot_number INTEGER PRIMARY KEY,
-                    number_plate TEXT,
-                    assigned_date TEXT)""")
-for i in range(1, 21):
-    cursor.execute("INSERT OR IGNORE INTO parking_slots (slot_number, number_plate, assigned_date) VALUES (?, NULL, NULL)", (i,))
-cursor.execute("""CREATE TABLE IF NOT EXISTS vehicles (
-                    number_plate TEXT PRIMARY KEY,
-                    owner_name TEXT,
-                    vehicle_type TEXT,
-                    allowed INTEGER NOT NULL CHECK(allowed IN (0, 1))
-                )""")
-conn.commit()
-conn.close()
-
-def preprocess_image(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    blur = cv2.GaussianBlur(gray, (3, 3), 0)
-    _, thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return thresh
-
-def assign_next_available_slot(number_plate):
-    conn = sqlite3.connect("vehicles.db")
-    cursor = conn.cursor()
-    today = datetime.now().strftime("%Y-%m-%d")
-    cursor.execute("SELECT slot_number FROM parking_slots WHERE number_plate IS NULL ORDER BY slot_number ASC")
-    row = cursor.fetchone()
-    if row:
-        slot = row[0]
-        cursor.execute("UPDATE parking_slots SET number_plate=?, assigned_date=? WHERE slot_number=?",
-                       (number_plate, today, slot))
-        conn.commit()
-        conn.close()
-        return slot
-    conn.close()
-    return None
-
-def get_assigned_slot(number_plate):
-    conn = sqlite3.connect("vehicles.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT slot_number FROM parking_slots WHERE number_plate=?", (number_plate,))
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else None
-
-last_seen = {}
-
-def run_detection():
-    cap = cv2.VideoCapture(0)
-    global last_seen
-    last_seen = {}
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        results = model(frame)
-        for r in results:
-            for box in r.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cropped = frame[y1:y2, x1:x2]
-                if cropped.size == 0:
-                    continue
-
-                processed_img = preprocess_image(cropped)
-                ocr_result = reader.readtext(processed_img)
-                if ocr_result:
-                    plate_text = ocr_result[0][1]
-                    plate_text_clean = ''.join(filter(str.isalnum, plate_text.upper()))
-                    current_time = time.time()
-
-                    if re.match(r"^[A-Z]{2}[0-9]{1,2}[A-Z]{1,3}[0-9]{4}$", plate_text_clean):
-                        if plate_text_clean not in last_seen or current_time - last_seen[plate_text_clean] > 5:
-                            last_seen[plate_text_clean] = current_time
-
-                            conn = sqlite3.connect("vehicles.db")
-                            cursor = conn.cursor()
-                            cursor.execute("SELECT owner_name FROM vehicles WHERE number_plate=?", (plate_text_clean,))
-                            result = cursor.fetchone()
+from loader import StartupTimer
 
-                            if result:
-                                slot = get_assigned_slot(plate_text_clean)
-                                if not slot:
-                                    slot = assign_next_available_slot(plate_text_clean)
-                                    if slot:
-                                        if arduino:
-                                            arduino.write(b'O')
-                                            time.sleep(3)
-                                            arduino.write(b'C')
-                                        messagebox.showinfo("Access Granted",
-                                                            f"Vehicle: {plate_text_clean}\nOwner: {result[0]}\nSlot: {slot}")
-                                else:
-                                    time.sleep(5)
-                                    cursor.execute("UPDATE parking_slots SET number_plate=NULL, assigned_date=NULL WHERE slot_number=?",
-                                                   (slot,))
-                                    conn.commit()
-                                    if arduino:
-                                        arduino.write(b'O')
-                                        time.sleep(3)
-                                        arduino.write(b'C')
-                                    messagebox.showinfo("Exit Recorded",
-                                                        f"Vehicle: {plate_text_clean}\nSlot {slot} is now free")
-                            conn.close()
-                            refresh_tables()
+startup = StartupTimer()
 
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(frame, plate_text_clean, (x1, y1 - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-
-        cv2.imshow("Live Vehicle Entry", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+import ttkbootstrap as ttk
+from tkinter import messagebox, ttk as tkttk
 
-    cap.release()
-    cv2.destroyAllWindows()
+from detection import is_valid_plate
+from config import ARDUINO_BAUDRATE, ARDUINO_PORT, BARRIER_HOLD_SECONDS, DASHBOARD_PAGE_SIZE, PARKING_LEVELS, SLOT_POLICY
+from barrier import BarrierController
+from service import GateService
+from dashboard import GateDashboard, vehicle_view, slot_view
 
-def live_detection():
-    thread = threading.Thread(target=run_detection)
-    thread.daemon = True
-    thread.start()
+# The dashboard is a client of the gate service; models load in the background
+# once the window is up and detection unlocks when they are ready
+service = GateService(levels=PARKING_LEVELS, slot_policy=SLOT_POLICY,
+                      barrier=BarrierController(ARDUINO_PORT, ARDUINO_BAUDRATE, hold_seconds=BARRIER_HOLD_SECONDS))
+repo, models = service.repo, service.models
 
 # GUI
 root = ttk.Window(themename="superhero")
@@ -156,13 +28,20 @@ main_frame.pack(fill='both', expand=True)
 title_label = ttk.Label(main_frame, text="Vehicle Entry & Parking Management", font=("Helvetica", 28, "bold"))
 title_label.pack(pady=10)
 
+status_label = ttk.Label(main_frame, text="Waiting for vehicles...", font=("Helvetica", 14))
+status_label.pack(pady=5)
+
+loading_bar = ttk.Progressbar(main_frame, bootstyle="info, striped", length=300, maximum=len(models.steps))
+loading_bar.pack(pady=5)
+
 btn_frame = ttk.Frame(main_frame)
 btn_frame.pack(pady=10)
 
-start_button = ttk.Button(btn_frame, text="Start Live Detection", bootstyle="success, outline", width=25, command=live_detection)
+start_button = ttk.Button(btn_frame, text="Loading models...", bootstyle="success, outline", width=25,
+                          command=lambda: app.live_detection(), state="disabled")
 start_button.grid(row=0, column=0, padx=10)
 
-refresh_button = ttk.Button(btn_frame, text="Refresh Tables", bootstyle="info, outline", width=25, command=lambda: refresh_tables())
+refresh_button = ttk.Button(btn_frame, text="Refresh Tables", bootstyle="info, outline", width=25, command=lambda: app.refresh_tables())
 refresh_button.grid(row=0, column=1, padx=10)
 
 exit_button = ttk.Button(btn_frame, text="Exit", bootstyle="danger, outline", width=25, command=root.destroy)
@@ -179,6 +58,8 @@ for col, w in zip(("number", "plate", "owner", "type"), (50, 120, 150, 100)):
     vehicle_table.heading(col, text=col.capitalize())
     vehicle_table.column(col, width=w, anchor="center", stretch=False)
 vehicle_table.pack(fill='both', expand=True)
+vehicles_view = vehicle_view(vehicle_table, repo, DASHBOARD_PAGE_SIZE)
+vehicles_view.pager(vehicle_frame).pack(pady=5)
 
 edit_btn = ttk.Button(vehicle_frame, text="Edit Selected", bootstyle="warning", command=lambda: edit_selected_vehicle())
 edit_btn.pack(pady=5)
@@ -194,6 +75,8 @@ for col, w in zip(("slot", "plate", "owner"), (80, 120, 150)):
     slots_table.heading(col, text=col.capitalize())
     slots_table.column(col, width=w, anchor="center", stretch=False)
 slots_table.pack(fill='both', expand=True)
+slots_view = slot_view(slots_table, repo, DASHBOARD_PAGE_SIZE)
+slots_view.pager(slots_frame).pack(pady=5)
 
 register_frame = ttk.Labelframe(main_frame, text="Register New Vehicle", padding=10)
 register_frame.pack(pady=10, fill='x')
@@ -211,9 +94,6 @@ submit_btn.grid(row=0, column=6, padx=10)
 
 plate_entry, owner_entry, type_entry = entries
 
-def is_valid_plate(plate):
-    return re.match(r"^[A-Z]{2}[0-9]{1,2}[A-Z]{1,3}[0-9]{4}$", plate) is not None
-
 def add_vehicle():
     plate = plate_entry.get().upper()
     owner = owner_entry.get()
@@ -224,19 +104,11 @@ def add_vehicle():
             messagebox.showerror("Invalid Format", "Enter valid Indian number plate format (e.g., MH04AB1234).")
             return
 
-        conn = sqlite3.connect("vehicles.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vehicles WHERE number_plate=?", (plate,))
-        if cursor.fetchone():
-            cursor.execute("UPDATE vehicles SET owner_name=?, vehicle_type=? WHERE number_plate=?", (owner, vtype, plate))
-            msg = "Vehicle updated successfully."
-        else:
-            cursor.execute("INSERT INTO vehicles (number_plate, owner_name, vehicle_type, allowed) VALUES (?, ?, ?, 1)", (plate, owner, vtype))
+        if repo.save_vehicle(plate, owner, vtype):
             msg = "Vehicle registered successfully."
-        conn.commit()
-        conn.close()
+        else:
+            msg = "Vehicle updated successfully."
         messagebox.showinfo("Success", msg)
-        refresh_tables()
         for e in entries:
             e.delete(0, 'end')
     else:
@@ -259,37 +131,7 @@ def delete_selected_vehicle():
         values = vehicle_table.item(selected[0], 'values')
         plate = values[1]
         if messagebox.askyesno("Confirm Delete", f"Delete vehicle {plate}?"):
-            conn = sqlite3.connect("vehicles.db")
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM vehicles WHERE number_plate=?", (plate,))
-            cursor.execute("UPDATE parking_slots SET number_plate=NULL, assigned_date=NULL WHERE number_plate=?", (plate,))
-            conn.commit()
-            conn.close()
-            refresh_tables()
-
-def refresh_tables():
-    conn = sqlite3.connect("vehicles.db")
-    cursor = conn.cursor()
-
-    for row in vehicle_table.get_children():
-        vehicle_table.delete(row)
-    cursor.execute("SELECT number_plate, owner_name, vehicle_type FROM vehicles")
-    for idx, (plate, owner, vtype) in enumerate(cursor.fetchall(), start=1):
-        vehicle_table.insert("", "end", values=(idx, plate, owner, vtype))
-
-    for row in slots_table.get_children():
-        slots_table.delete(row)
-    cursor.execute("SELECT slot_number, number_plate FROM parking_slots ORDER BY slot_number")
-    for slot_number, number_plate in cursor.fetchall():
-        owner = "-"
-        if number_plate:
-            cursor.execute("SELECT owner_name FROM vehicles WHERE number_plate=?", (number_plate,))
-            result = cursor.fetchone()
-            if result:
-                owner = result[0]
-        slots_table.insert("", "end", values=(slot_number, number_plate or "-", owner))
-
-    conn.close()
+            repo.delete_vehicle(plate)
 
-refresh_tables()
-root.mainloop()
+app = GateDashboard(root, service, startup, status_label, loading_bar, start_button, vehicles_view, slots_view)
+app.run()
@@ -0,0 +1,304 @@
+# Process-wide timers and counters for the gate hot paths, exported as
+# Prometheus text, a rotating JSON-lines log and on-demand stack samples.
+#
+#   with METRICS.timer("yolo"): ...            gate_latency_seconds{op="yolo"}
+#   METRICS.inc("decisions", decision="entry") gate_decisions_total{decision="entry"}
+#   curl localhost:9108/metrics
+#   curl "localhost:9108/profile?seconds=10" > gate.folded   (flamegraph.pl input)
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from urllib.parse import parse_qs, urlsplit
+
+# Log-linear buckets as in HdrHistogram: 64 sub-buckets per power of two of
+# microseconds (about 3% relative error) up to 2^36 us, so recording is one
+# index computation and quantiles are exact to the bucket at any scale
+SUB_BITS = 6
+MAX_MICROS = (1 << 36) - 1
+BUCKETS = ((MAX_MICROS.bit_length() - SUB_BITS) + 1) << SUB_BITS
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def _bucket(micros):
+    shift = max(0, micros.bit_length() - SUB_BITS)
+    return (shift << SUB_BITS) + (micros >> shift)
+
+
+def _bucket_value(index):
+    shift, sub = index >> SUB_BITS, index & ((1 << SUB_BITS) - 1)
+    return ((sub << shift) + ((1 << shift) - 1) / 2) / 1e6
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        index = _bucket(min(max(int(seconds * 1e6), 0), MAX_MICROS))
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantiles(self, qs=QUANTILES):
+        with self.lock:
+            counts, count = list(self.counts), self.count
+        values = {}
+        if not count:
+            return {q: 0.0 for q in qs}
+        targets = sorted(qs)
+        running = 0
+        for index, n in enumerate(counts):
+            if not n:
+                continue
+            running += n
+            while targets and running >= targets[0] * count:
+                values[targets.pop(0)] = _bucket_value(index)
+            if not targets:
+                break
+        return values
+
+    def snapshot(self):
+        quantiles = self.quantiles()
+        with self.lock:
+            count, total, peak = self.count, self.sum, self.max
+        snapshot = {"count": count, "mean_ms": 1000 * total / count if count else 0.0, "max_ms": 1000 * peak}
+        snapshot.update({f"p{q * 100:g}_ms".replace(".", ""): 1000 * value for q, value in quantiles.items()})
+        return snapshot
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _labels(pairs, **extra):
+    pairs = list(pairs) + list(extra.items())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+
+# Named histograms (operation latencies), counters and gauges (callables read
+# at export time). Labels are keyword arguments.
+class Metrics:
+    def __init__(self, prefix="gate"):
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = Counter()
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, op, **labels):
+        key = _key(op, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, op, seconds, **labels):
+        self.histogram(op, **labels).record(seconds)
+
+    @contextmanager
+    def timer(self, op, **labels):
+        histogram = self.histogram(op, **labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.record(time.perf_counter() - start)
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[_key(name, labels)] += value
+
+    def gauge(self, name, fn, **labels):
+        with self.lock:
+            self.gauges[_key(name, labels)] = fn
+
+    def _gauge_values(self):
+        with self.lock:
+            gauges = list(self.gauges.items())
+        values = []
+        for key, fn in gauges:
+            try:
+                values.append((key, float(fn())))
+            except Exception:
+                continue
+        return values
+
+    def snapshot(self):
+        with self.lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+
+        def name(key):
+            op, labels = key
+            return op + "".join(f",{k}={v}" for k, v in labels)
+        return {"latency": {name(key): histogram.snapshot() for key, histogram in histograms},
+                "counters": {name(key): value for key, value in counters},
+                "gauges": {name(key): value for key, value in self._gauge_values()}}
+
+    def prometheus(self):
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines = []
+        if histograms:
+            metric = f"{self.prefix}_latency_seconds"
+            lines += [f"# HELP {metric} Latency of instrumented gate operations",
+                      f"# TYPE {metric} summary"]
+            for (op, labels), histogram in histograms:
+                pairs = (("op", op),) + labels
+                for q, value in histogram.quantiles().items():
+                    lines.append(f"{metric}{_labels(pairs, quantile=q)} {value:.6g}")
+                lines.append(f"{metric}_sum{_labels(pairs)} {histogram.sum:.6g}")
+                lines.append(f"{metric}_count{_labels(pairs)} {histogram.count}")
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        for (name, labels), value in sorted(self._gauge_values()):
+            metric = f"{self.prefix}_{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{_labels(labels)} {value:.6g}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+# Wall-clock sampling profiler: every interval, the stack of every other thread
+# is recorded; returns folded stacks ("outer;inner count" lines) for
+# flamegraph.pl or speedscope. Costs nothing until it is asked for.
+def sample_profile(seconds=10.0, interval=0.005):
+    me = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            stacks[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def write_profile(path=None, seconds=10.0, interval=0.005):
+    path = path or time.strftime("profile-%Y%m%d-%H%M%S.folded")
+    folded = sample_profile(seconds, interval)
+    with open(path, "w") as f:
+        f.write(folded)
+    return path
+
+
+# JSON lines in a size-rotated file: a metrics snapshot every interval seconds
+# and, once attached to a bus, one line per gate decision
+class MetricsLog:
+    def __init__(self, metrics=METRICS, path="detection_log.txt", interval=60.0, max_bytes=5 * 1024 * 1024,
+                 backups=5):
+        self.metrics = metrics
+        self.interval = interval
+        self.logger = logging.getLogger(f"gate.metrics.{path}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+        self.subscription = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def attach(self, bus):
+        from events import DENIED, ENTRY, EXIT
+        self.subscription = bus.subscribe([ENTRY, EXIT, DENIED])
+        return self
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=2)
+        self._drain()
+        self.write("metrics", **self.metrics.snapshot())
+
+    def write(self, kind, **fields):
+        self.logger.info(json.dumps(dict(ts=round(time.time(), 3), type=kind, **fields), default=str))
+
+    def _drain(self):
+        if self.subscription is None:
+            return
+        for event in self.subscription.drain():
+            self.write("decision", decision=event.detail or event.kind, plate=event.plate, slot=event.slot,
+                       camera=event.camera, confidence=event.confidence)
+
+    def _run(self):
+        next_snapshot = time.monotonic() + self.interval
+        while not self.stop_event.wait(1.0):
+            self._drain()
+            if time.monotonic() >= next_snapshot:
+                next_snapshot += self.interval
+                self.write("metrics", **self.metrics.snapshot())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    metrics = METRICS
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            body, content_type = self.metrics.prometheus(), "text/plain; version=0.0.4"
+        elif url.path == "/profile":
+            try:
+                seconds = min(float(parse_qs(url.query).get("seconds", ["10"])[0]), 120.0)
+            except ValueError:
+                self.send_error(400, "seconds must be a number")
+                return
+            body, content_type = sample_profile(seconds), "text/plain"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# /metrics and /profile on a daemon thread, for processes without the gate API
+def serve_metrics(host="127.0.0.1", port=9108, metrics=METRICS):
+    handler = type("MetricsHandler", (_Handler,), {"metrics": metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
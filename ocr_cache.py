@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+# 64-bit difference hash of a crop: shrink to 9x8 gray and compare neighbours
+def dhash(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+# Bounded LRU/TTL cache of plate reads keyed by the crop's perceptual hash plus
+# its quantised box, so a car standing at the barrier is OCRed once.
+#
+# get(key, voter) returns (read, fresh) or None. A replayed read is not new
+# evidence, and neither is re-OCRing the same crop, so an entry is fresh once
+# per voter (a camera's track): later hits by that voter come back with
+# fresh=False, to be displayed without casting another vote. Reads that are
+# only displayed pass no voter and are always fresh.
+class PlateCache:
+    def __init__(self, maxsize=512, ttl=30.0, grid=16):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.grid = grid
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.repeats = 0
+
+    def key(self, crop, box):
+        x1, y1, x2, y2 = box
+        g = self.grid
+        return dhash(crop), x1 // g, y1 // g, (x2 - x1) // g, (y2 - y1) // g
+
+    def get(self, key, voter=None):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, read, voters = entry
+            if now - stored_at > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            fresh = voter is None or voter not in voters
+            if fresh and voter is not None:
+                voters.add(voter)
+            elif not fresh:
+                self.repeats += 1
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return read, fresh
+
+    def put(self, key, read, voter=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), read, set() if voter is None else {voter})
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "expirations": self.expirations, "repeats": self.repeats}
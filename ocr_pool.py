@@ -0,0 +1,358 @@
+# Plate OCR in worker processes, so preprocessing and recognition use every
+# core instead of sharing one GIL. Each worker loads its own EasyOCR reader
+# once. Crops travel through a shared-memory ring of fixed-size slots; only the
+# slot number and crop shapes are pickled, and each result comes back tagged
+# with its job id on the worker's own pipe, so a worker killed mid-send cannot
+# leave a lock held that the others need.
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from detection import read_plates
+from metrics import METRICS
+from preprocess import Preprocessor
+
+Job = namedtuple("Job", "job_id slot layout future worker attempts")
+
+
+def load_easyocr():
+    import easyocr
+    return easyocr.Reader(['en'])
+
+
+# Fixed-size slots in one shared-memory block. A slot is owned by one job from
+# acquire() until its result is back, so workers read crops in place.
+class SharedRing:
+    def __init__(self, slots, slot_bytes):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free = queue.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self, timeout=None):
+        return self.free.get(timeout=timeout)
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    # Copies the crops into the slot; returns [(offset, shape)] for the worker
+    def write(self, slot, crops):
+        offset = slot * self.slot_bytes
+        layout = []
+        for crop in crops:
+            view = np.ndarray(crop.shape, np.uint8, self.shm.buf, offset)
+            view[...] = crop
+            layout.append((offset, crop.shape))
+            offset += crop.nbytes
+        return layout
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Spawned children re-run the parent's main script unless it is hidden while
+# they start; main.py builds its Tk window at import time, and workers only
+# need this module
+@contextmanager
+def _main_script_hidden():
+    main = sys.modules["__main__"]
+    path, spec = main.__dict__.pop("__file__", None), getattr(main, "__spec__", None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__spec__ = spec
+        if path is not None:
+            main.__file__ = path
+
+
+def _worker(index, shm_name, jobs, results, preprocessor, load_reader):
+    # Ctrl+C goes to the whole process group; the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Spawned workers share the parent's resource tracker, which unlinks the segment once
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        reader = load_reader()
+    except Exception as e:
+        results.send(("error", index, f"{type(e).__name__}: {e}"))
+        shm.close()
+        return
+    results.send(("ready", index))
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, slot, layout = job
+        crops = [np.ndarray(shape, np.uint8, shm.buf, offset) for offset, shape in layout]
+        # Metrics recorded here would stay in this process; timings go back with the reads
+        timings = []
+        try:
+            reads = read_plates(reader, crops, preprocessor, on_timing=lambda op, s: timings.append((op, s)))
+        except Exception:
+            reads = [None] * len(crops)
+        del crops
+        results.send(("done", index, job_id, reads, timings))
+    shm.close()
+
+
+# read(crops) has the DetectionPipeline recognize() signature and may be called
+# from several threads at once; every call holds one ring slot per chunk of
+# crops, so the ring size bounds the work in flight, and raises TimeoutError if
+# its reads are not back within `timeout` seconds. A worker that dies is
+# restarted and its jobs are sent to the next ready worker, up to max_retries
+# times per job before its crops come back unread. A reader that fails to load
+# is fatal only until wait_ready() succeeds; later the worker is restarted with
+# a backoff that doubles up to max_backoff while it keeps failing.
+class OcrProcessPool:
+    def __init__(self, workers=2, preprocessor=None, slots=None, slot_bytes=1 << 20, load_reader=load_easyocr,
+                 max_retries=1, timeout=30.0, max_backoff=30.0):
+        self.workers = workers
+        self.preprocessor = preprocessor or Preprocessor()
+        self.slots = slots or 4 * workers
+        self.slot_bytes = slot_bytes
+        self.load_reader = load_reader
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.context = multiprocessing.get_context("spawn")
+
+        self.ring = None
+        self.processes = [None] * workers
+        self.job_queues = [None] * workers
+        self.result_pipes = [None] * workers
+        self.ready = set()
+        self.dead = set()
+        self.backoff = [0.0] * workers
+        self.respawn_at = [0.0] * workers
+        self.in_flight = {}
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.ready_changed = threading.Condition(self.lock)
+        self.error = None
+        self.last_error = None
+        self.started = False
+        self.stopping = False
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+
+        self.jobs = 0
+        self.crops = 0
+        self.restarts = 0
+        self.failed = 0
+
+    def start(self):
+        self.ring = SharedRing(self.slots, self.slot_bytes)
+        for index in range(self.workers):
+            self._spawn(index)
+        self.collector.start()
+        return self
+
+    # Blocks until every worker has loaded its reader; raises if one could not
+    def wait_ready(self, timeout=None):
+        with self.ready_changed:
+            if not self.ready_changed.wait_for(lambda: len(self.ready) == self.workers or self.error, timeout):
+                raise TimeoutError(f"OCR workers not ready after {timeout}s")
+            if self.error:
+                raise RuntimeError(f"OCR worker failed to start: {self.error}")
+            self.started = True
+        return self
+
+    def stop(self):
+        with self.lock:
+            self.stopping = True
+        for jobs in self.job_queues:
+            if jobs is not None:
+                jobs.put(None)
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        self.collector.join(timeout=2)
+        for pipe in self.result_pipes:
+            if pipe is not None:
+                pipe.close()
+        with self.lock:
+            for job in self.in_flight.values():
+                job.future.set_result([None] * len(job.layout))
+            self.in_flight.clear()
+        self.ring.close()
+
+    def _spawn(self, index):
+        jobs = self.context.Queue()
+        results, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=_worker, name=f"ocr-{index}", daemon=True,
+                                       args=(index, self.ring.name, jobs, sender, self.preprocessor,
+                                             self.load_reader))
+        with _main_script_hidden():
+            process.start()
+        # Only the worker holds the sending end, so its exit shows up as EOF here
+        sender.close()
+        self.job_queues[index] = jobs
+        self.result_pipes[index] = results
+        self.processes[index] = process
+
+    # Crops grouped so each group fits one slot; a crop bigger than a slot is scaled down
+    def _chunks(self, crops):
+        chunk, indices, used = [], [], 0
+        for i, crop in enumerate(crops):
+            if crop is None or crop.size == 0:
+                continue
+            if crop.nbytes > self.slot_bytes:
+                scale = (self.slot_bytes / crop.nbytes) ** 0.5 * 0.99
+                crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            if used + crop.nbytes > self.slot_bytes:
+                yield indices, chunk
+                chunk, indices, used = [], [], 0
+            chunk.append(np.ascontiguousarray(crop, np.uint8))
+            indices.append(i)
+            used += crop.nbytes
+        if chunk:
+            yield indices, chunk
+
+    def read(self, crops):
+        deadline = time.monotonic() + self.timeout
+        reads = [None] * len(crops)
+        pending = []
+        for indices, chunk in self._chunks(crops):
+            try:
+                slot = self.ring.acquire(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"no free OCR slot after {self.timeout}s") from None
+            pending.append((indices, self._submit(slot, self.ring.write(slot, chunk))))
+        for indices, future in pending:
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                raise TimeoutError(f"OCR reads not back after {self.timeout}s") from None
+            for i, read in zip(indices, result):
+                reads[i] = read
+        return reads
+
+    def _submit(self, slot, layout):
+        future = Future()
+        with self.lock:
+            self.jobs += 1
+            self.crops += len(layout)
+            self._dispatch(Job(next(self.job_ids), slot, layout, future, None, 0))
+        return future
+
+    # Least-loaded ready worker, or any live worker while none is ready yet. With
+    # every worker dead the job is parked (worker None) until one is restarted.
+    # Caller holds the lock.
+    def _dispatch(self, job):
+        candidates = self.ready or [index for index in range(self.workers) if index not in self.dead]
+        if not candidates:
+            self.in_flight[job.job_id] = job._replace(worker=None)
+            return
+        load = {index: 0 for index in candidates}
+        for other in self.in_flight.values():
+            if other.worker in load:
+                load[other.worker] += 1
+        worker = min(load, key=load.get)
+        self.in_flight[job.job_id] = job._replace(worker=worker)
+        self.job_queues[worker].put((job.job_id, job.slot, job.layout))
+
+    # Only this thread replaces workers once the pool has started
+    def _collect(self):
+        while True:
+            pipes = [pipe for pipe in self.result_pipes if pipe is not None]
+            ready = multiprocessing.connection.wait(pipes, timeout=0.5) if pipes else []
+            with self.lock:
+                for pipe in ready:
+                    self._receive(pipe)
+                if self.stopping:
+                    return
+                self._check_workers()
+
+    # Handles one message from a worker's pipe; a closed pipe is dropped
+    def _receive(self, pipe):
+        try:
+            self._handle(pipe.recv())
+        except (EOFError, OSError):
+            index = self.result_pipes.index(pipe)
+            self.result_pipes[index] = None
+            pipe.close()
+
+    def _handle(self, message):
+        kind, index = message[0], message[1]
+        if kind == "ready":
+            self.ready.add(index)
+            self.backoff[index] = 0.0
+            self.ready_changed.notify_all()
+        elif kind == "error":
+            # The worker exits after reporting; once running, _check_workers restarts it
+            self.last_error = message[2]
+            if not self.started:
+                self.error = message[2]
+                self.ready_changed.notify_all()
+        elif kind == "done":
+            job = self.in_flight.pop(message[2], None)
+            # A job re-sent after a crash may be answered twice; the first answer wins
+            if job is not None:
+                self.ring.release(job.slot)
+                job.future.set_result(message[3])
+                for op, seconds in message[4]:
+                    METRICS.observe(op, seconds)
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            if index not in self.dead:
+                self._worker_died(index, now)
+            if self.error or now < self.respawn_at[index]:
+                continue
+            self.restarts += 1
+            METRICS.inc("ocr_worker_restarts")
+            self.dead.discard(index)
+            self._spawn(index)
+            for job in [job for job in self.in_flight.values() if job.worker is None]:
+                self._dispatch(job)
+
+    # Takes the worker out of rotation and re-sends or fails the jobs it held
+    def _worker_died(self, index, now):
+        # Results it sent before exiting still count
+        while self.result_pipes[index] is not None and self.result_pipes[index].poll():
+            self._receive(self.result_pipes[index])
+        if self.result_pipes[index] is not None:
+            self.result_pipes[index].close()
+            self.result_pipes[index] = None
+        self.dead.add(index)
+        self.ready.discard(index)
+        self.respawn_at[index] = now + self.backoff[index]
+        self.backoff[index] = min(max(2 * self.backoff[index], 0.5), self.max_backoff)
+        for job in [job for job in self.in_flight.values() if job.worker == index]:
+            if job.attempts >= self.max_retries:
+                del self.in_flight[job.job_id]
+                self.failed += 1
+                self.ring.release(job.slot)
+                job.future.set_result([None] * len(job.layout))
+            else:
+                self._dispatch(job._replace(attempts=job.attempts + 1))
+
+    def stats(self):
+        with self.lock:
+            return {"workers": self.workers, "ready": len(self.ready), "jobs": self.jobs, "crops": self.crops,
+                    "in_flight": len(self.in_flight), "free_slots": self.ring.free.qsize() if self.ring else 0,
+                    "restarts": self.restarts, "failed": self.failed, "dead": len(self.dead),
+                    "last_error": self.last_error}
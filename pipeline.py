@@ -0,0 +1,523 @@
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+
+from detection import crop_box
+from metrics import METRICS
+
+# source names the file a frame came from when the capture reads files, else None
+Frame = namedtuple("Frame", "camera frame_id captured_at image source", defaults=(None,))
+PlateRead = namedtuple("PlateRead", "box text confidence track_id")
+FrameResult = namedtuple("FrameResult", "camera frame_id captured_at image plates source", defaults=(None,))
+
+
+# Bounded queue that drops the oldest item instead of blocking the producer.
+# With block=True (offline replay) the producer waits for room instead.
+# put() returns the item it dropped, if any.
+class DropOldestQueue:
+    def __init__(self, maxsize, block=False):
+        self.maxsize = maxsize
+        self.block = block
+        self.items = deque()
+        self.dropped = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def put(self, item):
+        dropped = None
+        with self.cond:
+            if self.block:
+                self.cond.wait_for(lambda: len(self.items) < self.maxsize or self.closed)
+            elif len(self.items) >= self.maxsize:
+                dropped = self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify_all()
+        return dropped
+
+    def get(self, timeout=None):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items, timeout):
+                raise queue.Empty
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    # Release producers blocked in put()
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        with self.cond:
+            return len(self.items)
+
+
+# Releases items in per-key sequence order (1, 2, 3, ...) when they arrive out
+# of order from parallel workers. skip() fills the hole of a sequence number
+# that will never arrive. Once max_held items wait behind a hole, the hole is
+# given up on and an item that still turns up for it is dropped, so one lost
+# sequence number cannot hold a key back. Not thread-safe; callers hold their
+# own lock.
+class ReorderBuffer:
+    def __init__(self, max_held=32):
+        self.max_held = max_held
+        self.next = {}
+        self.held = {}
+        self.reordered = 0
+        self.gaps = 0
+        self.late = 0
+
+    def push(self, key, seq, item):
+        expected = self.next.get(key, 1)
+        if seq < expected:
+            self.late += 1
+            return []
+        if seq != expected:
+            self.reordered += 1
+        self.held.setdefault(key, {})[seq] = item
+        return self._release(key)
+
+    def skip(self, key, seq):
+        self.held.setdefault(key, {})[seq] = None
+        return self._release(key)
+
+    def _release(self, key):
+        held = self.held[key]
+        seq = self.next.get(key, 1)
+        if len(held) > self.max_held and seq not in held:
+            self.gaps += 1
+            seq = min(held)
+        ready = []
+        while seq in held:
+            item = held.pop(seq)
+            if item is not None:
+                ready.append(item)
+            seq += 1
+        self.next[key] = seq
+        return ready
+
+
+# Latency samples of one stage; window=None keeps every sample (offline runs)
+class StageStats:
+    def __init__(self, window=200):
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            count = self.count
+        if not samples:
+            return {"count": count, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": count,
+            "avg_ms": 1000 * sum(samples) / len(samples),
+            "p50_ms": 1000 * samples[int(0.50 * (len(samples) - 1))],
+            "p95_ms": 1000 * samples[int(0.95 * (len(samples) - 1))],
+            "p99_ms": 1000 * samples[int(0.99 * (len(samples) - 1))],
+            "max_ms": 1000 * samples[-1],
+        }
+
+
+# Reads a directory of images in name order with the VideoCapture interface.
+# Unreadable files are skipped; `current` is the name of the file last read.
+class ImageFolderCapture:
+    EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+    def __init__(self, path):
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(self.EXTENSIONS))
+        self.position = 0
+        self.current = None
+
+    def set(self, prop, value):
+        return False
+
+    def read(self):
+        while self.position < len(self.files):
+            image = cv2.imread(self.files[self.position])
+            self.position += 1
+            if image is not None:
+                self.current = os.path.basename(self.files[self.position - 1])
+                return True, image
+        return False, None
+
+    def release(self):
+        pass
+
+
+def open_capture(source):
+    if isinstance(source, str) and os.path.isdir(source):
+        return ImageFolderCapture(source)
+    return cv2.VideoCapture(source)
+
+
+# One camera feed: its capture thread keeps only the newest frame. Each camera
+# has its own tracker, motion gate and counters. lossless=True makes capture
+# wait for inference instead, for replaying recorded footage frame by frame.
+class CameraStream:
+    def __init__(self, name, source, tracker=None, gate=None, lossless=False):
+        self.name = name
+        self.source = source
+        self.tracker = tracker
+        self.gate = gate
+        self.latest = DropOldestQueue(1, block=lossless)
+        self.done = threading.Event()
+        self.capture_stats = StageStats(None if lossless else 200)
+        self.inferred = 0
+        self.plates = 0
+
+    def capture(self, stop_event, on_frame):
+        cap = open_capture(self.source)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        frame_id = 0
+        try:
+            while not stop_event.is_set():
+                start = time.perf_counter()
+                ret, image = cap.read()
+                if not ret:
+                    break
+                elapsed = time.perf_counter() - start
+                self.capture_stats.record(elapsed)
+                METRICS.observe("capture", elapsed, camera=self.name)
+                frame_id += 1
+                self.latest.put(Frame(self, frame_id, time.perf_counter(), image, getattr(cap, "current", None)))
+                on_frame()
+        finally:
+            cap.release()
+            self.done.set()
+            on_frame()
+
+    def report(self):
+        report = {"capture": self.capture_stats.snapshot(), "inferred": self.inferred,
+                  "dropped": self.latest.dropped, "plates": self.plates}
+        if self.gate:
+            report["gate"] = self.gate.stats()
+        if self.tracker:
+            report["tracks"] = self.tracker.active()
+        return report
+
+
+# Capture -> YOLO -> OCR pool, joined by bounded drop-oldest queues. A single
+# inference worker serves every camera: it takes the newest frame of each camera
+# in round-robin order and runs them through YOLO as one batch.
+#
+# detect(images) returns one box list per image, recognize(crops) returns one
+# (text, confidence) or None per crop. With a tracker, only boxes whose track has
+# not settled on a plate are OCRed and every (camera, track_id, plate, confidence)
+# that reaches consensus is queued on `confirmed`, which never drops entries.
+# With a motion gate, YOLO only runs on the ROI crop of frames with motion in the
+# lane (or while a track is still open). Results leave in the order frames were
+# inferred for each camera, however the OCR workers finish them.
+#
+# With a LatencyScheduler, frames are only taken when the camera is due, detect
+# is called as detect(images, imgsz) with the scheduler's input size and open
+# tracks are OCRed on every scheduler.ocr_every-th frame; every end-to-end time
+# is fed back to it.
+class DetectionPipeline:
+    def __init__(self, cameras, detect, recognize, ocr_workers=2, queue_size=4, max_batch=4,
+                 lossless=False, stats_window=200, ocr_cache=None, scheduler=None):
+        self.cameras = cameras
+        self.detect = detect
+        self.recognize = recognize
+        self.ocr_workers = ocr_workers
+        self.max_batch = max_batch
+        self.ocr_cache = ocr_cache
+        self.scheduler = scheduler
+
+        self.ocr_jobs = DropOldestQueue(queue_size, block=lossless)
+        self.results = DropOldestQueue(queue_size, block=lossless)
+        self.confirmed = queue.Queue()
+        self.frame_ready = threading.Condition()
+        self.next_camera = 0
+        self.sequence = {}
+        self.order = ReorderBuffer(max(32, 4 * (queue_size + ocr_workers)))
+        self.publish_lock = threading.Lock()
+
+        self.stats = {name: StageStats(stats_window) for name in ("capture", "inference", "ocr", "end_to_end")}
+        self.batches = 0
+        self.batched_frames = 0
+        self.ocr_errors = 0
+        self.last_error = None
+        self.stop_event = threading.Event()
+        self.inference_done = threading.Event()
+        self.threads = []
+
+    def start(self):
+        self.threads = [threading.Thread(target=camera.capture, args=(self.stop_event, self._notify), daemon=True)
+                        for camera in self.cameras]
+        self.threads.append(threading.Thread(target=self._inference_loop, daemon=True))
+        for _ in range(self.ocr_workers):
+            self.threads.append(threading.Thread(target=self._ocr_loop, daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for q in [camera.latest for camera in self.cameras] + [self.ocr_jobs, self.results]:
+            q.close()
+        self._notify()
+        for thread in self.threads:
+            thread.join(timeout=2)
+
+    def running(self):
+        return (any(thread.is_alive() for thread in self.threads) or len(self.results) > 0
+                or not self.confirmed.empty())
+
+    def get_result(self, timeout=None):
+        return self.results.get(timeout)
+
+    def drain_confirmed(self):
+        plates = []
+        while True:
+            try:
+                plates.append(self.confirmed.get_nowait())
+            except queue.Empty:
+                return plates
+
+    def _notify(self):
+        with self.frame_ready:
+            self.frame_ready.notify()
+
+    def _next_sequence(self, camera):
+        self.sequence[camera.name] = self.sequence.get(camera.name, 0) + 1
+        return self.sequence[camera.name]
+
+    # Results are queued under the lock so two workers cannot interleave their releases
+    def _publish(self, camera, seq, result):
+        with self.publish_lock:
+            for ready in self.order.push(camera.name, seq, result):
+                self.results.put(ready)
+
+    def _skip(self, camera, seq):
+        with self.publish_lock:
+            for ready in self.order.skip(camera.name, seq):
+                self.results.put(ready)
+
+    # Newest frame of up to max_batch cameras, starting after the last camera served
+    def _next_batch(self):
+        batch = []
+        count = len(self.cameras)
+        for i in range(count):
+            camera = self.cameras[(self.next_camera + i) % count]
+            if self.scheduler and not (len(camera.latest) and self.scheduler.due(
+                    camera.name, camera.tracker.active() if camera.tracker else 0)):
+                continue
+            try:
+                batch.append(camera.latest.get(timeout=0))
+            except queue.Empty:
+                continue
+            if len(batch) == self.max_batch:
+                self.next_camera = (self.next_camera + i + 1) % count
+                return batch
+        self.next_camera = (self.next_camera + 1) % count
+        return batch
+
+    def _gate(self, frame):
+        camera = frame.camera
+        if not camera.gate:
+            return frame.image, (0, 0)
+        active = camera.tracker.active() if camera.tracker else 0
+        if not camera.gate.has_motion(frame.image) and not active:
+            camera.gate.record(frame.image, inferred=False)
+            METRICS.inc("frames_idle", camera=camera.name)
+            return None, None
+        camera.gate.record(frame.image, inferred=True)
+        return camera.gate.crop(frame.image)
+
+    def _inference_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                with self.frame_ready:
+                    batch = self._next_batch()
+                    if not batch:
+                        if all(camera.done.is_set() for camera in self.cameras):
+                            break
+                        self.frame_ready.wait(0.1)
+                        continue
+
+                frames, images, offsets = [], [], []
+                for frame in batch:
+                    image, offset = self._gate(frame)
+                    if image is None:
+                        self._publish(frame.camera, self._next_sequence(frame.camera),
+                                      FrameResult(frame.camera.name, frame.frame_id, frame.captured_at,
+                                                  frame.image, [], frame.source))
+                        continue
+                    frames.append(frame)
+                    images.append(image)
+                    offsets.append(offset)
+                if not frames:
+                    continue
+
+                start = time.perf_counter()
+                if self.scheduler:
+                    all_boxes = self.detect(images, self.scheduler.current.imgsz)
+                else:
+                    all_boxes = self.detect(images)
+                elapsed = time.perf_counter() - start
+                self.stats["inference"].record(elapsed)
+                METRICS.observe("yolo", elapsed, batch=len(frames))
+                self.batches += 1
+                self.batched_frames += len(frames)
+
+                for frame, boxes, (ox, oy) in zip(frames, all_boxes, offsets):
+                    camera = frame.camera
+                    camera.inferred += 1
+                    if ox or oy:
+                        boxes = [(x1 + ox, y1 + oy, x2 + ox, y2 + oy) for x1, y1, x2, y2 in boxes]
+                    if camera.tracker:
+                        tracked = camera.tracker.update(boxes)
+                    else:
+                        tracked = [(None, box, True) for box in boxes]
+                    ocr_every = self.scheduler.current.ocr_every if self.scheduler else 1
+                    if ocr_every > 1 and camera.inferred % ocr_every:
+                        tracked = [(track_id, box, needs_ocr and track_id is None)
+                                   for track_id, box, needs_ocr in tracked]
+                    dropped = self.ocr_jobs.put((self._next_sequence(camera), frame, tracked))
+                    if dropped:
+                        self._skip(dropped[1].camera, dropped[0])
+        finally:
+            self.inference_done.set()
+
+    def _ocr_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                seq, frame, tracked = self.ocr_jobs.get(timeout=0.1)
+            except queue.Empty:
+                if self.inference_done.is_set():
+                    break
+                continue
+            try:
+                self._process(seq, frame, tracked)
+            except Exception as e:
+                # The frame's sequence number is released so later results keep flowing
+                self.ocr_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                METRICS.inc("ocr_errors")
+                self._skip(frame.camera, seq)
+
+    def _process(self, seq, frame, tracked):
+        camera = frame.camera
+        tracker = camera.tracker
+        start = time.perf_counter()
+        pending = [(track_id, box) for track_id, box, needs_ocr in tracked if needs_ocr]
+        voters = [(camera.name, track_id) for track_id, _ in pending] if tracker else None
+        reads, fresh = self._read(frame.image, [box for _, box in pending], voters) if pending else ([], [])
+        read_by_box = {}
+        for (track_id, box), read, vote in zip(pending, reads, fresh):
+            text, confidence = read if read else (None, 0.0)
+            read_by_box[box] = (text, confidence)
+            if tracker and vote:
+                consensus = tracker.add_read(track_id, text, confidence)
+                if consensus:
+                    camera.plates += 1
+                    self.confirmed.put((camera.name, track_id) + consensus)
+
+        plates = []
+        for track_id, box, needs_ocr in tracked:
+            if needs_ocr:
+                text, confidence = read_by_box.get(box, (None, 0.0))
+            else:
+                text, confidence = tracker.plate_for(track_id)
+            plates.append(PlateRead(box, text, confidence, track_id))
+        now = time.perf_counter()
+        self.stats["ocr"].record(now - start)
+        self.stats["end_to_end"].record(now - frame.captured_at)
+        METRICS.observe("ocr", now - start)
+        METRICS.observe("end_to_end", now - frame.captured_at, camera=camera.name)
+        if self.scheduler:
+            self.scheduler.observe(now - frame.captured_at, now)
+        self._publish(camera, seq, FrameResult(camera.name, frame.frame_id, frame.captured_at, frame.image, plates,
+                                               frame.source))
+
+    # OCR the boxes of one frame, serving repeat crops from the cache. Returns
+    # (reads, fresh); with voters (one per box), fresh is False for a cached read
+    # that box's track already voted with, which is shown but not voted again.
+    def _read(self, image, boxes, voters=None):
+        crops = [crop_box(image, box) for box in boxes]
+        fresh = [True] * len(crops)
+        if self.ocr_cache is None:
+            return self.recognize(crops), fresh
+
+        reads = [None] * len(crops)
+        keys = [None] * len(crops)
+        misses = []
+        for i, (crop, box) in enumerate(zip(crops, boxes)):
+            if crop.size == 0:
+                continue
+            keys[i] = self.ocr_cache.key(crop, box)
+            entry = self.ocr_cache.get(keys[i], voters[i] if voters else None)
+            if entry is None:
+                misses.append(i)
+            else:
+                reads[i], fresh[i] = entry
+        if misses:
+            for i, read in zip(misses, self.recognize([crops[i] for i in misses])):
+                reads[i] = read
+                self.ocr_cache.put(keys[i], read, voters[i] if voters else None)
+        return reads, fresh
+
+    def queue_depths(self):
+        return {"frames": sum(len(camera.latest) for camera in self.cameras),
+                "ocr": len(self.ocr_jobs), "results": len(self.results)}
+
+    def report(self):
+        stages = {name: stats.snapshot() for name, stats in self.stats.items()}
+        capture = [camera.capture_stats.snapshot() for camera in self.cameras]
+        stages["capture"] = max(capture, key=lambda s: s["avg_ms"])
+        report = {
+            "stages": stages,
+            "queues": self.queue_depths(),
+            "dropped": {"frames": sum(camera.latest.dropped for camera in self.cameras),
+                        "ocr": self.ocr_jobs.dropped, "results": self.results.dropped},
+            "avg_batch": self.batched_frames / self.batches if self.batches else 0.0,
+            "reordered": self.order.reordered,
+            "ocr_errors": self.ocr_errors,
+            "cameras": {camera.name: camera.report() for camera in self.cameras},
+        }
+        if self.ocr_cache is not None:
+            report["ocr_cache"] = self.ocr_cache.stats()
+        if self.scheduler is not None:
+            report["scheduler"] = self.scheduler.status()
+        gates = [camera.gate.stats() for camera in self.cameras if camera.gate]
+        if gates:
+            seen = sum(g["frames_seen"] for g in gates)
+            report["gate"] = {
+                "frames_seen": seen,
+                "frames_skipped": sum(g["frames_skipped"] for g in gates),
+                "compute_saved": sum(g["compute_saved"] * g["frames_seen"] for g in gates) / seen if seen else 0.0,
+            }
+        return report
+
+
+def format_report(report):
+    stages = report["stages"]
+    queues = report["queues"]
+    text = "cap {:.0f}ms | yolo {:.0f}ms | ocr {:.0f}ms | e2e {:.0f}ms | q {}/{}/{}".format(
+        stages["capture"]["avg_ms"], stages["inference"]["avg_ms"], stages["ocr"]["avg_ms"],
+        stages["end_to_end"]["avg_ms"], queues["frames"], queues["ocr"], queues["results"])
+    if "gate" in report:
+        text += " | idle {} skipped, {:.0%} saved".format(report["gate"]["frames_skipped"],
+                                                       report["gate"]["compute_saved"])
+    if "ocr_cache" in report:
+        text += " | ocr cache {:.0%}".format(report["ocr_cache"]["hit_rate"])
+    if "scheduler" in report:
+        scheduler = report["scheduler"]
+        text += " | slo {:.0f}/{:.0f}ms {} {}px ocr 1/{}".format(
+            scheduler["p95_ms"], scheduler["budget_ms"], "ok" if scheduler["meeting_budget"] else "OVER",
+            scheduler["imgsz"], scheduler["ocr_every"])
+    return text
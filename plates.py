@@ -0,0 +1,231 @@
+import re
+import sqlite3
+import threading
+import time
+from itertools import product
+
+from metrics import METRICS
+
+# Indian registration grammar: state code, 1-2 digit district, 1-3 letter series, 4 digit number
+PLATE_PATTERN = re.compile(r"^[A-Z]{2}[0-9]{1,2}[A-Z]{1,3}[0-9]{4}$")
+
+STATE_CODES = frozenset((
+    "AN", "AP", "AR", "AS", "BR", "CG", "CH", "DD", "DL", "DN", "GA", "GJ", "HP", "HR", "JH", "JK",
+    "KA", "KL", "LA", "LD", "MH", "ML", "MN", "MP", "MZ", "NL", "OD", "OR", "PB", "PY", "RJ", "SK",
+    "TN", "TR", "TS", "UK", "UP", "WB",
+))
+
+# Characters OCR commonly swaps, by the class the grammar expects at that position
+TO_LETTER = {"0": "O", "1": "I", "2": "Z", "4": "A", "5": "S", "6": "G", "7": "T", "8": "B"}
+TO_DIGIT = {"O": "0", "D": "0", "Q": "0", "U": "0", "I": "1", "L": "1", "J": "1", "Z": "2",
+            "A": "4", "S": "5", "G": "6", "T": "7", "B": "8"}
+
+
+def clean_plate_text(text):
+    return ''.join(filter(str.isalnum, text.upper()))
+
+
+def is_valid_plate(plate):
+    return PLATE_PATTERN.match(plate) is not None and plate[:2] in STATE_CODES
+
+
+def _coerce(text, letters):
+    out = []
+    fixes = 0
+    for ch, want_letter in zip(text, letters):
+        if want_letter and ch.isdigit():
+            ch = TO_LETTER.get(ch)
+            fixes += 1
+        elif not want_letter and ch.isalpha():
+            ch = TO_DIGIT.get(ch)
+            fixes += 1
+        if ch is None:
+            return None, 0
+        out.append(ch)
+    return "".join(out), fixes
+
+
+# Every grammatical reading of an OCR string, fewest corrections first. Each
+# split of the text into state/district/series/number gets letters forced at
+# letter positions and digits at digit positions through the confusion tables.
+def candidates(text):
+    text = clean_plate_text(text)
+    found = {}
+    for district, series in product((1, 2), (1, 2, 3)):
+        if len(text) != 2 + district + series + 4:
+            continue
+        letters = [True] * 2 + [False] * district + [True] * series + [False] * 4
+        plate, fixes = _coerce(text, letters)
+        if plate and plate[:2] in STATE_CODES and fixes < found.get(plate, len(text) + 1):
+            found[plate] = fixes
+    return sorted(found, key=found.get)
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _deletions(word, k):
+    variants = frontier = {word}
+    for _ in range(k):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants = variants | frontier
+    return variants
+
+
+# Symmetric-delete index: two words within edit distance k share a string made
+# by deleting at most k characters from each, so search(word, k) is a handful
+# of dict lookups plus an edit_distance check per candidate, and words can be
+# added and removed one at a time.
+class DeletionIndex:
+    def __init__(self, words=(), k=1):
+        self.k = k
+        self.buckets = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        for variant in _deletions(word, self.k):
+            self.buckets.setdefault(variant, set()).add(word)
+
+    def discard(self, word):
+        for variant in _deletions(word, self.k):
+            bucket = self.buckets.get(variant)
+            if bucket is not None:
+                bucket.discard(word)
+                if not bucket:
+                    del self.buckets[variant]
+
+    # k may not exceed the k the index was built with
+    def search(self, word, k=1):
+        words = {match for variant in _deletions(word, k) for match in self.buckets.get(variant, ())}
+        found = []
+        for match in words:
+            d = edit_distance(word, match)
+            if d <= k:
+                found.append((d, match))
+        return sorted(found)
+
+
+# OCR read -> plate. Candidates from the grammar are checked against the
+# registered plates (exact, then edit distance <= max_distance for reads that
+# needed correction); a unique hit wins, otherwise the best grammatical
+# candidate is returned, or None.
+#
+# The registry index is kept current off the OCR path: an updater thread
+# applies changed plates one by one, or builds a fresh index and swaps it in
+# when more than bulk_rebuild plates changed at once (bulk imports). Lookups
+# only wait for the very first build.
+class PlateMatcher:
+    def __init__(self, repo=None, max_distance=1, bulk_rebuild=256):
+        self.repo = repo
+        self.max_distance = max_distance
+        self.bulk_rebuild = bulk_rebuild
+        self.plates = set()
+        self.index = DeletionIndex(k=max_distance)
+        self.lock = threading.Lock()
+        self.dirty = set()
+        self.changed = threading.Event()
+        self.built = threading.Event()
+        self.rebuilds = 0
+        self.corrected = 0
+        self.matched = 0
+        if repo is None:
+            self.built.set()
+        else:
+            repo.subscribe(self._on_change)
+            threading.Thread(target=self._update, daemon=True).start()
+
+    def _on_change(self, kind, key):
+        if kind == "vehicle":
+            with self.lock:
+                self.dirty.add(key)
+            self.changed.set()
+
+    def _rebuild(self):
+        plates = {vehicle.number_plate for vehicle in self.repo.list_vehicles()}
+        index = DeletionIndex(plates, self.max_distance)
+        with self.lock:
+            self.plates, self.index = plates, index
+            self.rebuilds += 1
+
+    def _update(self):
+        try:
+            self._rebuild()
+        except sqlite3.Error:
+            # No vehicles table yet: start empty, the first registration fills it in
+            pass
+        finally:
+            self.built.set()
+        while self.changed.wait():
+            self.changed.clear()
+            with self.lock:
+                dirty, self.dirty = self.dirty, set()
+            try:
+                self._apply(dirty)
+            except sqlite3.Error:
+                # Database busy: keep the plates for the next attempt
+                with self.lock:
+                    self.dirty |= dirty
+                time.sleep(1.0)
+                self.changed.set()
+
+    def _apply(self, dirty):
+        if len(dirty) > self.bulk_rebuild:
+            self._rebuild()
+        else:
+            registered = {plate: self.repo.get_vehicle(plate) is not None for plate in dirty}
+            with self.lock:
+                for plate, present in registered.items():
+                    if present and plate not in self.plates:
+                        self.plates.add(plate)
+                        self.index.add(plate)
+                    elif not present and plate in self.plates:
+                        self.plates.discard(plate)
+                        self.index.discard(plate)
+
+    def known(self, plate):
+        self.built.wait()
+        with self.lock:
+            return plate in self.plates
+
+    def normalize(self, text):
+        with METRICS.timer("plate_validation"):
+            return self._normalize(text)
+
+    def _normalize(self, text):
+        cleaned = clean_plate_text(text)
+        options = candidates(cleaned)
+        self.built.wait()
+        with self.lock:
+            # A read that already parses cleanly is trusted as is: it only matches
+            # itself, so an unregistered plate one confusion or one character away
+            # from a registered one is not snapped onto it
+            if options[:1] == [cleaned]:
+                plate = cleaned if cleaned in self.plates else None
+            else:
+                plate = next((option for option in options if option in self.plates), None)
+                if plate is None and self.max_distance:
+                    # The raw read is searched too: a dropped or doubled character breaks the grammar
+                    queries = set(options) | {cleaned}
+                    near = {word for query in queries for _, word in self.index.search(query, self.max_distance)}
+                    plate = near.pop() if len(near) == 1 else None
+        if plate is not None:
+            self.matched += 1
+        elif options:
+            plate = options[0]
+        else:
+            return None
+        if plate != cleaned:
+            self.corrected += 1
+        return plate
+
+    def stats(self):
+        return {"registered": len(self.plates), "corrected": self.corrected, "matched": self.matched,
+                "rebuilds": self.rebuilds}
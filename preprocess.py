@@ -0,0 +1,128 @@
+import math
+import threading
+
+import cv2
+import numpy as np
+
+MODES = ("otsu", "adaptive", "clahe")
+
+
+# Plate preprocessing on reusable buffers. Each crop is resized straight to the
+# OCR height with its width rounded up to a bucket, so every later step (gray,
+# blur, threshold, deskew) writes into an array preallocated for that bucket
+# via OpenCV's dst= outputs. Buffers are per thread, so one Preprocessor can be
+# shared by all OCR workers.
+#
+# mode: "otsu" (global, the old behaviour), "adaptive" (local mean, copes with
+# uneven night lighting) or "clahe" (contrast equalisation, then Otsu).
+# deskew=True straightens tilted plates from the moments of the dark pixels.
+class Preprocessor:
+    def __init__(self, mode="otsu", deskew=False, height=64, bucket=16, max_width=1024,
+                 block_size=15, offset=9, clip_limit=2.0, max_angle=15.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown preprocess mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.deskew = deskew
+        self.height = height
+        self.bucket = bucket
+        self.max_width = max_width
+        self.block_size = block_size
+        self.offset = offset
+        self.clip_limit = clip_limit
+        self.max_angle = max_angle
+        self.local = threading.local()
+
+    # Thread-local buffers stay behind when a preprocessor is sent to an OCR worker process
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def _buffer(self, name, shape):
+        buffers = self.local.__dict__.setdefault("buffers", {})
+        buf = buffers.get((name, shape))
+        if buf is None:
+            buf = buffers[(name, shape)] = np.empty(shape, np.uint8)
+        return buf
+
+    def _clahe(self):
+        clahe = getattr(self.local, "clahe", None)
+        if clahe is None:
+            clahe = self.local.clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=(2, 8))
+        return clahe
+
+    def width_for(self, crop):
+        h, w = crop.shape[:2]
+        width = math.ceil(w * self.height / h / self.bucket) * self.bucket
+        return min(max(width, self.bucket), self.max_width)
+
+    # Binarised strip of shape (height, width_for(crop)). The array is a
+    # buffer owned by this thread and is overwritten by the next call.
+    def process(self, crop):
+        shape = (self.height, self.width_for(crop))
+        size = shape[::-1]
+        gray = self._buffer("gray", shape)
+        if crop.ndim == 3:
+            resized = self._buffer("bgr", shape + (crop.shape[2],))
+            cv2.resize(crop, size, dst=resized, interpolation=cv2.INTER_LINEAR)
+            cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY if crop.shape[2] == 3 else cv2.COLOR_BGRA2GRAY, dst=gray)
+        else:
+            cv2.resize(crop, size, dst=gray, interpolation=cv2.INTER_LINEAR)
+
+        smooth = self._buffer("smooth", shape)
+        binary = self._buffer("binary", shape)
+        if self.mode == "clahe":
+            self._clahe().apply(gray, dst=smooth)
+            cv2.threshold(smooth, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=binary)
+        elif self.mode == "adaptive":
+            cv2.GaussianBlur(gray, (3, 3), 0, dst=smooth)
+            cv2.adaptiveThreshold(smooth, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                  self.block_size, self.offset, dst=binary)
+        else:
+            cv2.GaussianBlur(gray, (3, 3), 0, dst=smooth)
+            cv2.threshold(smooth, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=binary)
+
+        if self.deskew:
+            return self._deskew(binary, shape)
+        return binary
+
+    def _deskew(self, binary, shape):
+        ink = self._buffer("ink", shape)
+        cv2.bitwise_not(binary, dst=ink)
+        m = cv2.moments(ink, binaryImage=True)
+        if not m["m00"]:
+            return binary
+        angle = math.degrees(0.5 * math.atan2(2 * m["mu11"], m["mu20"] - m["mu02"]))
+        if abs(angle) < 1.0 or abs(angle) > self.max_angle:
+            return binary
+        rotated = self._buffer("rotated", shape)
+        matrix = cv2.getRotationMatrix2D((m["m10"] / m["m00"], m["m01"] / m["m00"]), angle, 1.0)
+        cv2.warpAffine(binary, matrix, shape[::-1], dst=rotated, flags=cv2.INTER_NEAREST,
+                       borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+        return rotated
+
+    # All crops of a frame side by side on one white canvas, ready for the
+    # recognizer. Returns (canvas, boxes, index): boxes are EasyOCR
+    # [x_min, x_max, y_min, y_max] lists and index maps each box back to its
+    # position in crops. Unusable crops are skipped. The canvas is reused too.
+    def batch(self, crops, gap=8):
+        index = [i for i, crop in enumerate(crops)
+                 if crop.size and crop.shape[0] >= 2 and crop.shape[1] >= 2]
+        if not index:
+            return None, [], []
+        widths = [self.width_for(crops[i]) for i in index]
+        total = sum(widths) + gap * (len(widths) + 1)
+        # Canvas widths are bucketed coarsely; the spare columns stay white
+        canvas = self._buffer("canvas", (self.height, math.ceil(total / 256) * 256))
+        canvas.fill(255)
+        boxes = []
+        x = gap
+        for i, w in zip(index, widths):
+            canvas[:, x:x + w] = self.process(crops[i])
+            boxes.append([x, x + w, 0, self.height])
+            x += w + gap
+        return canvas, boxes, index
@@ -0,0 +1,226 @@
+# Offline replay and benchmark of the detection path. A video file or image
+# directory goes through the same preprocess, YOLO, OCR, plate validation and
+# slot logic as the live gate, with no GUI and no Arduino.
+#
+#   python replay.py gate_footage.mp4 --labels labels.csv --output run.json
+#
+# labels.csv has `frame,plate` rows: the frame number for videos, the file name
+# for image directories.
+import argparse
+import csv
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+from config import (DETECTOR_BACKEND, DETECTOR_INT8, DETECTOR_WEIGHTS, KNOWN_PLATE_VOTES, MOTION_THRESHOLD,
+                    OCR_CACHE_SIZE, OCR_CACHE_TTL, OCR_PROCESSES, PARKING_LEVELS, PREPROCESS_DESKEW,
+                    PREPROCESS_MODE)
+from detector import BACKENDS, load_detector, warm_up
+from detection import detect_plates, read_plates
+from events import DENIED, ENTRY, EXIT, EventBus
+from gate import GateWorker
+from gating import MotionGate
+from ocr_cache import PlateCache
+from ocr_pool import OcrProcessPool
+from preprocess import MODES, Preprocessor
+from pipeline import CameraStream, DetectionPipeline, StageStats
+from repository import DB_PATH, Repository
+from tracker import PlateTracker
+from plates import PlateMatcher
+
+
+def load_labels(path):
+    labels = {}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0].strip().lower() == "frame":
+                continue
+            labels[row[0].strip()] = row[1].strip().upper()
+    return labels
+
+
+# Peak resident memory, sampled in the background
+class MemorySampler:
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss(self):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, self._rss())
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self._rss())
+        return self.peak
+
+
+def run_replay(source, model, reader, labels=None, db_path=None, use_gate=True, ocr_workers=2,
+               preprocessor=None):
+    labels = labels or {}
+    preprocessor = preprocessor or Preprocessor(PREPROCESS_MODE, PREPROCESS_DESKEW)
+
+    # Slot logic runs against a scratch copy so replays never touch the live registry
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    scratch = os.path.join(workdir, "vehicles.db")
+    if os.path.exists(db_path or DB_PATH):
+        shutil.copyfile(db_path or DB_PATH, scratch)
+    repo = Repository(scratch)
+    repo.ensure_schema(PARKING_LEVELS)
+    matcher = PlateMatcher(repo)
+    bus = EventBus()
+    gate_worker = GateWorker(repo, bus).start()
+    decisions = bus.subscribe([ENTRY, EXIT, DENIED])
+
+    timings = {name: StageStats(None) for name in ("preprocess", "recognize", "decision")}
+    tracker = PlateTracker(normalize=matcher.normalize, known=matcher.known, known_votes=KNOWN_PLATE_VOTES)
+    camera = CameraStream("replay", source, tracker=tracker,
+                          gate=MotionGate(threshold=MOTION_THRESHOLD) if use_gate else None, lossless=True)
+    # A process pool preprocesses and reads in its workers, so there is no split to time here
+    if isinstance(reader, OcrProcessPool):
+        recognize = reader.read
+    else:
+        recognize = lambda crops: read_plates(reader, crops, preprocessor,
+                                              on_timing=lambda stage, s: timings[stage].record(s))
+    pipeline = DetectionPipeline(
+        [camera],
+        lambda frames: detect_plates(model, frames),
+        recognize,
+        ocr_workers=ocr_workers, lossless=True, stats_window=None,
+        ocr_cache=PlateCache(OCR_CACHE_SIZE, OCR_CACHE_TTL))
+
+    memory = MemorySampler().start()
+    frames = 0
+    frame_hits = 0
+    labelled_frames = 0
+    confirmed = []
+    submitted = {}
+    outcomes = {}
+
+    def handle_decisions():
+        for event in decisions.drain():
+            outcomes[event.detail or event.kind] = outcomes.get(event.detail or event.kind, 0) + 1
+            if event.plate in submitted:
+                timings["decision"].record(event.timestamp - submitted.pop(event.plate))
+
+    start = time.perf_counter()
+    pipeline.start()
+    while pipeline.running():
+        for _, _, plate_text, confidence in pipeline.drain_confirmed():
+            confirmed.append((plate_text, confidence))
+            submitted[plate_text] = time.time()
+            gate_worker.submit(plate_text, camera.name, confidence)
+        handle_decisions()
+        try:
+            result = pipeline.get_result(timeout=0.2)
+        except queue.Empty:
+            continue
+        frames += 1
+        key = result.source or str(result.frame_id)
+        if key in labels:
+            labelled_frames += 1
+            if any(plate.text == labels[key] for plate in result.plates):
+                frame_hits += 1
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+    gate_worker.stop()
+    handle_decisions()
+    peak = memory.stop()
+    repo.pool.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    report = pipeline.report()
+    stages = report["stages"]
+    stages.update({name: stats.snapshot() for name, stats in timings.items()})
+    expected = set(labels.values())
+    read = {plate for plate, _ in confirmed}
+    return {
+        "source": source,
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed else 0.0,
+        "stages": stages,
+        "gate": report.get("gate"),
+        "confirmed": [{"plate": plate, "confidence": confidence} for plate, confidence in confirmed],
+        "decisions": outcomes,
+        "accuracy": {
+            "labelled_frames": labelled_frames,
+            "frame_accuracy": frame_hits / labelled_frames if labelled_frames else None,
+            "plate_recall": len(read & expected) / len(expected) if expected else None,
+            "plate_precision": len(read & expected) / len(read) if expected and read else None,
+        },
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay footage through the detection path and benchmark it")
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--labels", help="CSV of frame,plate ground truth")
+    parser.add_argument("--weights", default=DETECTOR_WEIGHTS)
+    parser.add_argument("--backend", choices=BACKENDS, default=DETECTOR_BACKEND)
+    parser.add_argument("--int8", action="store_true", default=DETECTOR_INT8, help="use the quantised export")
+    parser.add_argument("--db", help=f"registry to copy for the slot logic (default {DB_PATH})")
+    parser.add_argument("--no-gate", action="store_true", help="run YOLO on every frame")
+    parser.add_argument("--ocr-workers", type=int, default=2, help="OCR threads")
+    parser.add_argument("--ocr-processes", type=int, default=OCR_PROCESSES,
+                        help="OCR worker processes, one EasyOCR reader each (0: OCR on threads)")
+    parser.add_argument("--preprocess", choices=MODES, default=PREPROCESS_MODE)
+    parser.add_argument("--deskew", action="store_true", default=PREPROCESS_DESKEW)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    model = load_detector(args.weights, args.backend, int8=args.int8)
+    warm_up(model)
+    preprocessor = Preprocessor(args.preprocess, args.deskew)
+    if args.ocr_processes:
+        reader = OcrProcessPool(args.ocr_processes, preprocessor).start().wait_ready()
+    else:
+        import easyocr
+        reader = easyocr.Reader(['en'])
+
+    try:
+        results = run_replay(args.source, model, reader, load_labels(args.labels) if args.labels else None,
+                             args.db, use_gate=not args.no_gate,
+                             ocr_workers=max(args.ocr_workers, 2 * args.ocr_processes),
+                             preprocessor=preprocessor)
+    finally:
+        if args.ocr_processes:
+            reader.stop()
+
+    print(f"{results['frames']} frames in {results['seconds']:.1f}s -> {results['fps']:.2f} fps, "
+          f"peak memory {results['peak_memory_mb']:.0f} MB")
+    print(f"{'stage':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in results["stages"].items():
+        print(f"{name:<12} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+    accuracy = results["accuracy"]
+    if accuracy["labelled_frames"]:
+        print(f"frame accuracy {accuracy['frame_accuracy']:.1%}, plate recall {accuracy['plate_recall']:.1%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
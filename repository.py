@@ -0,0 +1,372 @@
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import METRICS
+from slots import SlotAllocator, SlotInfo
+
+DB_PATH = "vehicles.db"
+
+Vehicle = namedtuple("Vehicle", "number_plate owner_name vehicle_type allowed")
+Slot = namedtuple("Slot", "slot_number number_plate assigned_date")
+SlotRow = namedtuple("SlotRow", "slot_number number_plate owner_name")
+
+# Statements are kept as module constants so every pooled connection reuses
+# its prepared-statement cache instead of recompiling SQL per call.
+SELECT_VEHICLE = "SELECT number_plate, owner_name, vehicle_type, allowed FROM vehicles WHERE number_plate=?"
+SELECT_VEHICLES = "SELECT number_plate, owner_name, vehicle_type, allowed FROM vehicles"
+SELECT_VEHICLES_IN_ORDER = SELECT_VEHICLES + " ORDER BY rowid"
+INSERT_VEHICLE = "INSERT INTO vehicles (number_plate, owner_name, vehicle_type, allowed) VALUES (?, ?, ?, ?)"
+INSERT_VEHICLE_IF_ABSENT = ("INSERT OR IGNORE INTO vehicles (number_plate, owner_name, vehicle_type, allowed) "
+                            "VALUES (?, ?, ?, ?)")
+UPDATE_VEHICLE = "UPDATE vehicles SET owner_name=?, vehicle_type=? WHERE number_plate=?"
+UPDATE_VEHICLE_ALLOWED = "UPDATE vehicles SET owner_name=?, vehicle_type=?, allowed=? WHERE number_plate=?"
+UPSERT_VEHICLE = ("INSERT INTO vehicles (number_plate, owner_name, vehicle_type, allowed) VALUES (?, ?, ?, ?) "
+                  "ON CONFLICT (number_plate) DO UPDATE SET owner_name=excluded.owner_name, "
+                  "vehicle_type=excluded.vehicle_type, allowed=excluded.allowed")
+DELETE_VEHICLE = "DELETE FROM vehicles WHERE number_plate=?"
+SELECT_SLOTS = "SELECT slot_number, number_plate, assigned_date FROM parking_slots ORDER BY slot_number"
+SELECT_VEHICLE_PAGE = ("SELECT number_plate, owner_name, vehicle_type, allowed FROM vehicles "
+                       "ORDER BY rowid LIMIT ? OFFSET ?")
+COUNT_VEHICLES = "SELECT COUNT(*) FROM vehicles"
+SELECT_SLOT_ROWS = ("SELECT s.slot_number, s.number_plate, v.owner_name FROM parking_slots s "
+                    "LEFT JOIN vehicles v ON v.number_plate = s.number_plate")
+SELECT_SLOT_PAGE = SELECT_SLOT_ROWS + " ORDER BY s.slot_number LIMIT ? OFFSET ?"
+SELECT_SLOT_ROW = SELECT_SLOT_ROWS + " WHERE s.slot_number=?"
+COUNT_SLOTS = "SELECT COUNT(*) FROM parking_slots"
+SELECT_SLOT_FOR_PLATE = "SELECT slot_number FROM parking_slots WHERE number_plate=?"
+SELECT_FREE_SLOT_DETAILS = ("SELECT slot_number, level, distance, slot_type FROM parking_slots "
+                            "WHERE number_plate IS NULL")
+CLAIM_SLOT = ("UPDATE parking_slots SET number_plate=?, assigned_date=? "
+              "WHERE slot_number=? AND number_plate IS NULL RETURNING slot_number")
+RELEASE_SLOT = ("UPDATE parking_slots SET number_plate=NULL, assigned_date=NULL "
+                "WHERE slot_number=? AND number_plate IS NOT NULL RETURNING slot_number, level, distance, slot_type")
+RELEASE_PLATE = ("UPDATE parking_slots SET number_plate=NULL, assigned_date=NULL "
+                 "WHERE number_plate=? RETURNING slot_number, level, distance, slot_type")
+INSERT_SLOT = ("INSERT OR IGNORE INTO parking_slots (slot_number, number_plate, assigned_date, level, distance) "
+               "VALUES (?, NULL, NULL, ?, ?)")
+SELECT_LAST_CHANGE = "SELECT COALESCE(MAX(seq), 0) FROM change_log"
+SELECT_CHANGES = "SELECT seq, kind, key FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?"
+PRUNE_CHANGES = "DELETE FROM change_log WHERE seq <= (SELECT COALESCE(MAX(seq), 0) FROM change_log) - ?"
+
+EVENTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    plate TEXT,
+    gate TEXT,
+    slot INTEGER,
+    confidence REAL,
+    decision TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_plate_ts ON events (plate, ts);
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vehicles (
+    number_plate TEXT PRIMARY KEY,
+    owner_name TEXT,
+    vehicle_type TEXT,
+    allowed INTEGER NOT NULL CHECK(allowed IN (0, 1))
+);
+CREATE TABLE IF NOT EXISTS parking_slots (
+    slot_number INTEGER PRIMARY KEY,
+    number_plate TEXT,
+    assigned_date TEXT,
+    level INTEGER NOT NULL DEFAULT 1,
+    distance REAL,
+    slot_type TEXT
+);
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key NOT NULL
+);
+"""
+
+# Every vehicle and slot row change, from any connection or process, leaves its
+# key in change_log, so caches can follow the tables without full reloads. The
+# repository keeps only the newest rows (see Repository.prune_changes)
+CHANGE_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS {table}_{name} AFTER {event} ON {table} BEGIN "
+    f"INSERT INTO change_log (kind, key) VALUES ('{kind}', {row}.{key}); END"
+    for table, kind, key in (("vehicles", "vehicle", "number_plate"), ("parking_slots", "slot", "slot_number"))
+    for name, event, row in (("inserted", "INSERT", "NEW"), ("updated", "UPDATE", "NEW"), ("deleted", "DELETE", "OLD"))
+]
+
+# Columns added after the first release, for databases created by older versions
+SLOT_COLUMNS = [
+    ("level", "INTEGER NOT NULL DEFAULT 1"),
+    ("distance", "REAL"),
+    ("slot_type", "TEXT"),
+]
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_parking_slots_plate ON parking_slots (number_plate);
+"""
+
+# Rough walking distance added per level for the nearest-to-gate policy;
+# operators can store measured distances in parking_slots.distance instead.
+LEVEL_DISTANCE = 50
+
+
+# Small pool of long-lived WAL connections shared by the GUI and detection threads
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=4, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.slots = threading.Semaphore(size)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               isolation_level=None, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        self.slots.acquire()
+        try:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self.idle.put(conn)
+        finally:
+            self.slots.release()
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class Repository:
+    def __init__(self, path=DB_PATH, pool_size=4, slot_policy="lowest", keep_changes=10000):
+        self.pool = ConnectionPool(path, pool_size)
+        self.keep_changes = keep_changes
+        self.allocator = SlotAllocator(self, slot_policy)
+        self.listeners = []
+
+    # Change stream: listener(kind, key) is called after every committed write,
+    # with kind "vehicle" (key = number plate) or "slot" (key = slot number)
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def _notify(self, kind, *keys):
+        for listener in self.listeners:
+            for key in keys:
+                listener(kind, key)
+
+    # levels is the number of slots on each level, e.g. [20] or [400, 400, 250]
+    def ensure_schema(self, levels=(20,)):
+        with self.pool.transaction() as conn:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(parking_slots)")}
+            for column, definition in SLOT_COLUMNS:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE parking_slots ADD COLUMN {column} {definition}")
+            for statement in (INDEXES + EVENTS_SCHEMA).split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            for statement in CHANGE_TRIGGERS:
+                conn.execute(statement)
+            conn.execute(PRUNE_CHANGES, (self.keep_changes,))
+
+            rows = []
+            slot_number = 0
+            for level, count in enumerate(levels, start=1):
+                for position in range(1, count + 1):
+                    slot_number += 1
+                    rows.append((slot_number, level, float(position + LEVEL_DISTANCE * (level - 1))))
+            conn.executemany(INSERT_SLOT, rows)
+        self.allocator.set_policy(self.allocator.policy)
+
+    # Change log: (seq, kind, key) rows after seq, oldest first
+    def last_change(self):
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_LAST_CHANGE).fetchone()[0]
+
+    def changes_since(self, seq, limit=1000):
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_CHANGES, (seq, limit)).fetchall()
+
+    # Drops all but the newest keep_changes rows. Also runs at startup and after
+    # bulk inserts, and AuthCache calls it on its poll; a follower further
+    # behind sees a gap in seq and reloads instead.
+    def prune_changes(self):
+        with self.pool.transaction() as conn:
+            conn.execute(PRUNE_CHANGES, (self.keep_changes,))
+
+    # Just the event log table, for tools that read it without running the gate
+    def ensure_event_table(self):
+        with self.pool.transaction() as conn:
+            for statement in EVENTS_SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+
+    def set_slot_policy(self, policy):
+        self.allocator.set_policy(policy)
+
+    # Vehicles
+    def get_vehicle(self, number_plate):
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_VEHICLE, (number_plate,)).fetchone()
+        return Vehicle(*row) if row else None
+
+    def list_vehicles(self):
+        with self.pool.connection() as conn:
+            return [Vehicle(*row) for row in conn.execute(SELECT_VEHICLES)]
+
+    # Streams the registry in insertion order without materialising it
+    def iter_vehicles(self, chunk=1000):
+        with self.pool.connection() as conn:
+            cursor = conn.execute(SELECT_VEHICLES_IN_ORDER)
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    return
+                for row in rows:
+                    yield Vehicle(*row)
+
+    def vehicle_page(self, offset, limit):
+        with self.pool.connection() as conn:
+            return [Vehicle(*row) for row in conn.execute(SELECT_VEHICLE_PAGE, (limit, offset))]
+
+    def count_vehicles(self):
+        with self.pool.connection() as conn:
+            return conn.execute(COUNT_VEHICLES).fetchone()[0]
+
+    # Insert or update owner/type, and allowed unless it is None (new vehicles
+    # then default to allowed); returns True when the vehicle is new
+    def save_vehicle(self, number_plate, owner_name, vehicle_type, allowed=None):
+        with self.pool.transaction() as conn:
+            created = conn.execute(SELECT_VEHICLE, (number_plate,)).fetchone() is None
+            if created:
+                conn.execute(INSERT_VEHICLE, (number_plate, owner_name, vehicle_type,
+                                              1 if allowed is None else allowed))
+            elif allowed is None:
+                conn.execute(UPDATE_VEHICLE, (owner_name, vehicle_type, number_plate))
+            else:
+                conn.execute(UPDATE_VEHICLE_ALLOWED, (owner_name, vehicle_type, allowed, number_plate))
+            slots = [row[0] for row in conn.execute(SELECT_SLOT_FOR_PLATE, (number_plate,))]
+        self._notify("vehicle", number_plate)
+        self._notify("slot", *slots)
+        return created
+
+    def add_vehicles(self, vehicles):
+        vehicles = list(vehicles)
+        with self.pool.transaction() as conn:
+            conn.executemany(INSERT_VEHICLE, vehicles)
+            conn.execute(PRUNE_CHANGES, (self.keep_changes,))
+        self._notify("vehicle", *(vehicle[0] for vehicle in vehicles))
+
+    # Insert new plates and overwrite owner/type/allowed of existing ones, in one transaction
+    def upsert_vehicles(self, vehicles):
+        vehicles = list(vehicles)
+        with self.pool.transaction() as conn:
+            conn.executemany(UPSERT_VEHICLE, vehicles)
+            conn.execute(PRUNE_CHANGES, (self.keep_changes,))
+        self._notify("vehicle", *(vehicle[0] for vehicle in vehicles))
+        return len(vehicles)
+
+    def register_vehicle(self, number_plate, owner_name, vehicle_type, allowed=1):
+        with self.pool.transaction() as conn:
+            conn.execute(INSERT_VEHICLE_IF_ABSENT, (number_plate, owner_name, vehicle_type, allowed))
+        self._notify("vehicle", number_plate)
+
+    def delete_vehicle(self, number_plate):
+        with self.pool.transaction() as conn:
+            conn.execute(DELETE_VEHICLE, (number_plate,))
+            freed = [SlotInfo(*row) for row in conn.execute(RELEASE_PLATE, (number_plate,))]
+        for info in freed:
+            self.allocator.release(info)
+        self._notify("vehicle", number_plate)
+        self._notify("slot", *(info.slot_number for info in freed))
+
+    # Slots
+    def list_slots(self):
+        with self.pool.connection() as conn:
+            return [Slot(*row) for row in conn.execute(SELECT_SLOTS)]
+
+    # Slot rows with the owner joined in, for the dashboard
+    def slot_page(self, offset, limit):
+        with self.pool.connection() as conn:
+            return [SlotRow(*row) for row in conn.execute(SELECT_SLOT_PAGE, (limit, offset))]
+
+    def get_slot_row(self, slot_number):
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_SLOT_ROW, (slot_number,)).fetchone()
+        return SlotRow(*row) if row else None
+
+    def count_slots(self):
+        with self.pool.connection() as conn:
+            return conn.execute(COUNT_SLOTS).fetchone()[0]
+
+    def get_assigned_slot(self, number_plate):
+        with METRICS.timer("db_get_assigned_slot"), self.pool.connection() as conn:
+            row = conn.execute(SELECT_SLOT_FOR_PLATE, (number_plate,)).fetchone()
+        return row[0] if row else None
+
+    def list_free_slot_details(self):
+        with self.pool.connection() as conn:
+            return [SlotInfo(*row) for row in conn.execute(SELECT_FREE_SLOT_DETAILS)]
+
+    # Atomically take a slot if it is still free; False when another writer got it first
+    def claim_slot(self, slot_number, number_plate):
+        today = datetime.now().strftime("%Y-%m-%d")
+        with self.pool.connection() as conn:
+            claimed = bool(conn.execute(CLAIM_SLOT, (number_plate, today, slot_number)).fetchall())
+        if claimed:
+            self._notify("slot", slot_number)
+        return claimed
+
+    def assign_next_available_slot(self, number_plate, vehicle_type=None):
+        with METRICS.timer("db_assign_slot"):
+            return self.allocator.allocate(number_plate, vehicle_type)
+
+    def release_slot(self, slot_number):
+        with METRICS.timer("db_release_slot"), self.pool.connection() as conn:
+            rows = conn.execute(RELEASE_SLOT, (slot_number,)).fetchall()
+        for row in rows:
+            self.allocator.release(SlotInfo(*row))
+            self._notify("slot", slot_number)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_repository():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Repository()
+        return _default
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# One rung of the degradation ladder: share of the camera's target frame rate,
+# YOLO input size, and OCR on every n-th inferred frame of an open track
+Level = namedtuple("Level", "fps_scale imgsz ocr_every")
+
+LEVELS = (
+    Level(1.0, 640, 1),
+    Level(0.75, 640, 1),
+    Level(0.75, 512, 2),
+    Level(0.5, 416, 2),
+    Level(0.5, 320, 3),
+    Level(0.25, 320, 4),
+)
+
+
+# Keeps end-to-end latency (frame captured -> plate read) under budget_ms.
+# The p95 of the last `window` seconds is checked every adjust_every seconds:
+# over budget steps one level down the ladder, and recover_after seconds below
+# low_water * budget steps back up. Each camera is sampled at active_fps while
+# its tracker has an open track and idle_fps otherwise, times the level's
+# fps_scale; the motion gate still decides which sampled frames reach YOLO.
+class LatencyScheduler:
+    def __init__(self, budget_ms=500, active_fps=15.0, idle_fps=5.0, levels=LEVELS, window=2.0,
+                 adjust_every=1.0, low_water=0.6, recover_after=3.0):
+        self.budget = budget_ms / 1000
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.levels = levels
+        self.window = window
+        self.adjust_every = adjust_every
+        self.low_water = low_water
+        self.recover_after = recover_after
+
+        self.lock = threading.Lock()
+        self.level = 0
+        self.samples = deque()
+        self.p95 = 0.0
+        self.last_adjust = None
+        self.below_since = None
+        self.next_due = {}
+        self.sampled = {}
+        self.active = {}
+        self.changes = 0
+        self.observed = 0
+        self.over_budget = 0
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    # True when the camera's next frame should be processed; called with the
+    # camera's open-track count by the inference loop
+    def due(self, camera, active, now=None):
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            self._adjust(now)
+            self.active[camera] = bool(active)
+            if now < self.next_due.get(camera, 0.0):
+                return False
+            self.next_due[camera] = now + 1 / self._target_fps(camera)
+            self.sampled.setdefault(camera, deque(maxlen=30)).append(now)
+            return True
+
+    def _target_fps(self, camera):
+        return (self.active_fps if self.active.get(camera) else self.idle_fps) * self.current.fps_scale
+
+    # End-to-end latency of one processed frame, in seconds
+    def observe(self, seconds, now=None):
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            self.samples.append((now, seconds))
+            self.observed += 1
+            if seconds > self.budget:
+                self.over_budget += 1
+            self._adjust(now)
+
+    def _adjust(self, now):
+        while self.samples and self.samples[0][0] < now - self.window:
+            self.samples.popleft()
+        if self.last_adjust is None:
+            self.last_adjust = now
+        if now - self.last_adjust < self.adjust_every:
+            return
+        self.last_adjust = now
+        # No samples means nothing was read lately, which counts as headroom
+        latencies = sorted(seconds for _, seconds in self.samples)
+        self.p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+        if self.p95 > self.budget:
+            self.below_since = None
+            if self.level < len(self.levels) - 1:
+                self._set_level(self.level + 1)
+        elif self.p95 < self.low_water * self.budget:
+            if self.below_since is None:
+                self.below_since = now
+            elif now - self.below_since >= self.recover_after and self.level > 0:
+                self._set_level(self.level - 1)
+                self.below_since = now
+        else:
+            self.below_since = None
+
+    # Latencies measured at the old level say nothing about the new one
+    def _set_level(self, level):
+        self.level = level
+        self.changes += 1
+        self.samples.clear()
+
+    def status(self):
+        with self.lock:
+            level = self.current
+            cameras = {}
+            for camera, times in self.sampled.items():
+                span = times[-1] - times[0] if len(times) > 1 else 0.0
+                cameras[camera] = {"active": self.active.get(camera, False),
+                                   "target_fps": self._target_fps(camera),
+                                   "sampled_fps": (len(times) - 1) / span if span else 0.0}
+            return {
+                "budget_ms": 1000 * self.budget,
+                "p95_ms": 1000 * self.p95,
+                "meeting_budget": self.p95 <= self.budget,
+                "within_budget": 1 - self.over_budget / self.observed if self.observed else 1.0,
+                "level": self.level,
+                "imgsz": level.imgsz,
+                "ocr_every": level.ocr_every,
+                "changes": self.changes,
+                "cameras": cameras,
+            }
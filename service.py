@@ -0,0 +1,182 @@
+import queue
+import threading
+
+from config import (ACTIVE_FPS, CAMERAS, DETECTOR_BACKEND, DETECTOR_INT8, DETECTOR_WEIGHTS, IDLE_FPS,
+                    KNOWN_PLATE_VOTES, LATENCY_BUDGET_MS, METRICS_LOG, METRICS_LOG_BACKUPS, METRICS_LOG_INTERVAL,
+                    METRICS_LOG_MAX_BYTES, MOTION_THRESHOLD, OCR_CACHE_SIZE, OCR_CACHE_TTL, OCR_PROCESSES,
+                    PARKING_LEVELS, PREPROCESS_DESKEW, PREPROCESS_MODE, SLOT_POLICY)
+from detection import detect_plates, read_plates
+from detector import load_detector, warm_up
+from eventlog import EventLog
+from events import EventBus
+from gate import GateWorker
+from gating import MotionGate
+from loader import BackgroundLoader
+from metrics import METRICS, MetricsLog
+from ocr_cache import PlateCache
+from ocr_pool import OcrProcessPool
+from pipeline import CameraStream, DetectionPipeline, DropOldestQueue
+from plates import PlateMatcher
+from preprocess import Preprocessor
+from repository import default_repository
+from scheduler import LatencyScheduler
+from tracker import PlateTracker
+
+
+def _load_reader(results):
+    import easyocr
+    return easyocr.Reader(['en'])
+
+
+def _start_pool(processes, preprocessor):
+    pool = OcrProcessPool(processes, preprocessor).start()
+    try:
+        return pool.wait_ready()
+    except Exception:
+        pool.stop()
+        raise
+
+
+# Background loader for the detector (plus warm-up) and the OCR reader, or a
+# pool of OCR worker processes when ocr_processes > 0
+def model_loader(weights=DETECTOR_WEIGHTS, backend=DETECTOR_BACKEND, int8=DETECTOR_INT8,
+                 ocr_processes=OCR_PROCESSES, preprocessor=None):
+    if ocr_processes:
+        preprocessor = preprocessor or Preprocessor(PREPROCESS_MODE, PREPROCESS_DESKEW)
+        load_ocr = lambda results: _start_pool(ocr_processes, preprocessor)
+    else:
+        load_ocr = _load_reader
+    return BackgroundLoader([
+        ("detector", lambda results: load_detector(weights, backend, int8=int8)),
+        ("warm-up", lambda results: warm_up(results["detector"])),
+        ("ocr", load_ocr),
+    ])
+
+
+# The gate without any UI: registry, event bus, authorization, event log,
+# optional barrier and the detection pipeline. The Tk dashboard, the headless
+# server and the HTTP API are all clients of one GateService.
+#
+# Confirmed plates are handed to the gate worker on the service's own thread;
+# annotated frames go to `frames` (newest only) for whoever wants to show them.
+class GateService:
+    def __init__(self, repo=None, levels=PARKING_LEVELS, slot_policy=SLOT_POLICY, barrier=None, models=None,
+                 preprocessor=None, ocr_workers=2, max_batch=4, latency_budget_ms=LATENCY_BUDGET_MS):
+        self.repo = repo or default_repository()
+        self.repo.ensure_schema(levels)
+        self.repo.set_slot_policy(slot_policy)
+        self.matcher = PlateMatcher(self.repo)
+        self.bus = EventBus()
+        self.bus.attach(self.repo)
+        self.gate_worker = GateWorker(self.repo, self.bus)
+        self.event_log = EventLog(self.repo).attach(self.bus)
+        self.metrics_log = MetricsLog(METRICS, METRICS_LOG, METRICS_LOG_INTERVAL, METRICS_LOG_MAX_BYTES,
+                                      METRICS_LOG_BACKUPS).attach(self.bus)
+        self.barrier = barrier.attach(self.bus) if barrier else None
+        self.models = models or model_loader()
+        self.preprocessor = preprocessor or Preprocessor(PREPROCESS_MODE, PREPROCESS_DESKEW)
+        self.ocr_workers = ocr_workers
+        self.max_batch = max_batch
+        self.latency_budget_ms = latency_budget_ms
+
+        self.pipeline = None
+        self.consumer = None
+        self.frames = DropOldestQueue(2)
+        self.on_result = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.gate_worker.start()
+        self.event_log.start()
+        self.metrics_log.start()
+        if self.barrier:
+            self.barrier.start()
+        if not self.models.thread.is_alive() and not self.models.ready.is_set():
+            self.models.start()
+        return self
+
+    def stop(self):
+        self.stop_detection()
+        self.gate_worker.stop()
+        self.event_log.stop()
+        self.metrics_log.stop()
+        if self.barrier:
+            self.barrier.stop()
+        if isinstance(self.models.results.get("ocr"), OcrProcessPool):
+            self.models["ocr"].stop()
+
+    def build_cameras(self, cameras=None):
+        return [CameraStream(camera["name"], camera["source"],
+                             tracker=PlateTracker(normalize=self.matcher.normalize, known=self.matcher.known,
+                                                  known_votes=KNOWN_PLATE_VOTES),
+                             gate=MotionGate(camera.get("roi"), threshold=MOTION_THRESHOLD))
+                for camera in (cameras or CAMERAS)]
+
+    # cameras: config-style dicts (name, source, roi); blocks until the models are loaded
+    def start_detection(self, cameras=None):
+        with self.lock:
+            if self.detecting():
+                return self.pipeline
+            self.models.ready.wait()
+            model, reader = self.models["detector"], self.models["ocr"]
+            if isinstance(reader, OcrProcessPool):
+                # Two OCR threads per process keep the next crops in shared memory while one is read
+                recognize, ocr_workers = reader.read, max(self.ocr_workers, 2 * reader.workers)
+            else:
+                recognize, ocr_workers = (lambda crops: read_plates(reader, crops, self.preprocessor),
+                                          self.ocr_workers)
+            self.pipeline = DetectionPipeline(
+                self.build_cameras(cameras),
+                lambda frames, imgsz=None: detect_plates(model, frames, imgsz),
+                recognize,
+                ocr_workers=ocr_workers, max_batch=self.max_batch,
+                ocr_cache=PlateCache(OCR_CACHE_SIZE, OCR_CACHE_TTL),
+                scheduler=LatencyScheduler(self.latency_budget_ms, ACTIVE_FPS, IDLE_FPS)
+                if self.latency_budget_ms else None)
+            self.pipeline.start()
+            self._register_gauges(self.pipeline)
+            self.consumer = threading.Thread(target=self._consume, args=(self.pipeline,), daemon=True)
+            self.consumer.start()
+            return self.pipeline
+
+    def stop_detection(self):
+        with self.lock:
+            pipeline, consumer = self.pipeline, self.consumer
+            if pipeline is None:
+                return
+            pipeline.stop()
+            consumer.join(timeout=2)
+
+    # Read at export time, so they always describe the running pipeline
+    def _register_gauges(self, pipeline):
+        METRICS.gauge("ocr_queue_depth", lambda: len(pipeline.ocr_jobs))
+        METRICS.gauge("result_queue_depth", lambda: len(pipeline.results))
+        if pipeline.scheduler:
+            METRICS.gauge("scheduler_level", lambda: pipeline.scheduler.level)
+            METRICS.gauge("scheduler_p95_seconds", lambda: pipeline.scheduler.p95)
+
+    def detecting(self):
+        return self.consumer is not None and self.consumer.is_alive()
+
+    def _consume(self, pipeline):
+        while pipeline.running():
+            for camera, _, plate_text, confidence in pipeline.drain_confirmed():
+                self.gate_worker.submit(plate_text, camera, confidence)
+            try:
+                result = pipeline.get_result(timeout=0.2)
+            except queue.Empty:
+                continue
+            if self.on_result:
+                self.on_result(result)
+            self.frames.put(result)
+
+    def report(self):
+        report = {"models": self.models.status(), "gate": self.gate_worker.cache.stats(),
+                  "event_log": self.event_log.stats(), "plates": self.matcher.stats()}
+        if self.pipeline is not None:
+            report["pipeline"] = self.pipeline.report()
+        if self.barrier:
+            report["barrier"] = self.barrier.stats()
+        if isinstance(self.models.results.get("ocr"), OcrProcessPool):
+            report["ocr_pool"] = self.models["ocr"].stats()
+        return report
@@ -1,49 +1,35 @@
-import sqlite3
 import os
+import sys
+
+from repository import DB_PATH, Repository
+from vehicle_io import import_vehicles
 
 # Delete existing DB if it exists (CAUTION: Deletes all previous data!)
-if os.path.exists("vehicles.db"):
-    os.remove("vehicles.db")
+if os.path.exists(DB_PATH):
+    os.remove(DB_PATH)
     print("Old database removed.")
-
-# Connect to new DB
-conn = sqlite3.connect("vehicles.db")
-cursor = conn.cursor()
-
-# Create vehicles table
-cursor.execute("""
-CREATE TABLE vehicles (
-    number_plate TEXT PRIMARY KEY,
-    owner_name TEXT,
-    vehicle_type TEXT,
-    allowed INTEGER NOT NULL CHECK(allowed IN (0, 1))
-)
-""")
-
-# Create parking_slots table
-cursor.execute("""
-CREATE TABLE parking_slots (
-    slot_number INTEGER PRIMARY KEY,
-    number_plate TEXT,
-    assigned_date TEXT
-)
-""")
-
-# Insert only 20 parking slots
-for i in range(1, 21):
-    cursor.execute("INSERT INTO parking_slots (slot_number, number_plate, assigned_date) VALUES (?, NULL, NULL)", (i,))
-
-# Sample vehicles (optional)
-vehicles = [
-    ("MH04FZ8259", "Ravi Kumar", "Car", 1),
-    ("DL8CAF7654", "Raihan", "Bike", 1),
-    ("KA03MN4567", "Amit Joshi", "Truck", 0),
-    ("RJ14CV0002", "Sanmeet Singh", "Car", 1)
-]
-
-for vehicle in vehicles:
-    cursor.execute("INSERT INTO vehicles (number_plate, owner_name, vehicle_type, allowed) VALUES (?, ?, ?, ?)", vehicle)
-
-conn.commit()
-conn.close()
+for suffix in ("-wal", "-shm"):
+    if os.path.exists(DB_PATH + suffix):
+        os.remove(DB_PATH + suffix)
+
+# Create vehicles and parking_slots tables with only 20 parking slots
+repo = Repository(DB_PATH)
+repo.ensure_schema([20])
+
+# Seed from a CSV/XLSX registry if one is given (python setup_database.py vehicle_log.xlsx),
+# otherwise a few sample vehicles
+if len(sys.argv) > 1:
+    result = import_vehicles(repo, sys.argv[1],
+                             on_reject=lambda reject: print(f"line {reject.line}: {reject.reason}"))
+    print(f"{result.imported} vehicles imported, {result.rejected} rejected.")
+else:
+    vehicles = [
+        ("MH04FZ8259", "Ravi Kumar", "Car", 1),
+        ("DL8CAF7654", "Raihan", "Bike", 1),
+        ("KA03MN4567", "Amit Joshi", "Truck", 0),
+        ("RJ14CV0002", "Sanmeet Singh", "Car", 1)
+    ]
+    repo.add_vehicles(vehicles)
+
+repo.pool.close()
 print("✅ New database with 20 slots created.")
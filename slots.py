@@ -0,0 +1,165 @@
+import heapq
+import random
+import threading
+from collections import namedtuple
+
+SlotInfo = namedtuple("SlotInfo", "slot_number level distance slot_type")
+
+
+# Free-slot indexes. Each policy keeps the free slots in the structure that makes
+# its pick O(1) or O(log n): add() puts a slot back, take() removes and returns
+# the next slot for a vehicle, discard() drops a slot someone else claimed.
+class LowestFirst:
+    def __init__(self):
+        self.heap = []
+        self.free = set()
+
+    def key(self, info):
+        return info.slot_number
+
+    def add(self, info):
+        if info.slot_number not in self.free:
+            self.free.add(info.slot_number)
+            heapq.heappush(self.heap, (self.key(info), info.slot_number))
+
+    def discard(self, slot_number):
+        self.free.discard(slot_number)
+
+    def take(self, vehicle_type=None):
+        while self.heap:
+            _, slot_number = heapq.heappop(self.heap)
+            if slot_number in self.free:
+                self.free.remove(slot_number)
+                return slot_number
+        return None
+
+    def __len__(self):
+        return len(self.free)
+
+
+class NearestToGate(LowestFirst):
+    def key(self, info):
+        distance = info.distance if info.distance is not None else float(info.slot_number)
+        return distance, info.level
+
+
+class RandomSlot:
+    def __init__(self):
+        self.slots = []
+        self.position = {}
+
+    def add(self, info):
+        if info.slot_number not in self.position:
+            self.position[info.slot_number] = len(self.slots)
+            self.slots.append(info.slot_number)
+
+    def discard(self, slot_number):
+        i = self.position.pop(slot_number, None)
+        if i is None:
+            return
+        last = self.slots.pop()
+        if last != slot_number:
+            self.slots[i] = last
+            self.position[last] = i
+
+    def take(self, vehicle_type=None):
+        if not self.slots:
+            return None
+        slot_number = random.choice(self.slots)
+        self.discard(slot_number)
+        return slot_number
+
+    def __len__(self):
+        return len(self.slots)
+
+
+# Slots with a slot_type only go to that vehicle type; untyped slots take anyone
+class ByVehicleType:
+    def __init__(self):
+        self.by_type = {}
+        self.slot_type = {}
+
+    def _index(self, slot_type):
+        if slot_type not in self.by_type:
+            self.by_type[slot_type] = NearestToGate()
+        return self.by_type[slot_type]
+
+    def add(self, info):
+        slot_type = info.slot_type.lower() if info.slot_type else None
+        self.slot_type[info.slot_number] = slot_type
+        self._index(slot_type).add(info)
+
+    def discard(self, slot_number):
+        slot_type = self.slot_type.get(slot_number)
+        if slot_type in self.by_type:
+            self.by_type[slot_type].discard(slot_number)
+
+    def take(self, vehicle_type=None):
+        if vehicle_type:
+            slot_number = self._index(vehicle_type.lower()).take()
+            if slot_number is not None:
+                return slot_number
+        return self._index(None).take()
+
+    def __len__(self):
+        return sum(len(index) for index in self.by_type.values())
+
+
+POLICIES = {
+    "lowest": LowestFirst,
+    "nearest": NearestToGate,
+    "random": RandomSlot,
+    "type": ByVehicleType,
+}
+
+
+# In-memory free-slot index in front of parking_slots. A slot is only handed
+# out once the conditional UPDATE ... RETURNING confirms it was still free, so
+# two gates (or two processes) can never get the same slot.
+class SlotAllocator:
+    def __init__(self, repo, policy="lowest"):
+        self.repo = repo
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.index = None
+
+    def reload(self):
+        index = POLICIES[self.policy]()
+        for info in self.repo.list_free_slot_details():
+            index.add(info)
+        self.index = index
+
+    def set_policy(self, policy):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slot policy {policy!r}, expected one of {sorted(POLICIES)}")
+        with self.lock:
+            self.policy = policy
+            self.index = None
+
+    def allocate(self, number_plate, vehicle_type=None):
+        with self.lock:
+            if self.index is None:
+                self.reload()
+            reloaded = False
+            while True:
+                slot_number = self.index.take(vehicle_type)
+                if slot_number is None:
+                    # Slots freed by another process only show up after a reload
+                    if reloaded:
+                        return None
+                    self.reload()
+                    reloaded = True
+                    continue
+                if self.repo.claim_slot(slot_number, number_plate):
+                    return slot_number
+
+    def release(self, info):
+        with self.lock:
+            if self.index is not None and info is not None:
+                self.index.add(info)
+
+    def free_count(self):
+        with self.lock:
+            if self.index is None:
+                self.reload()
+            return len(self.index)
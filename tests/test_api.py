@@ -0,0 +1,45 @@
+import asyncio
+import base64
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from api import GateApi
+from events import EventBus
+
+
+def handshake_status(token=None, **headers):
+    async def run():
+        api = await GateApi(SimpleNamespace(repo=None, bus=EventBus()), port=0, token=token).start()
+        port = api.server.sockets[0].getsockname()[1]
+        target = headers.pop("target", "/ws")
+        headers.setdefault("Host", f"127.0.0.1:{port}")
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        lines = [f"GET {target} HTTP/1.1", "Upgrade: websocket", "Connection: Upgrade",
+                 f"Sec-WebSocket-Key: {base64.b64encode(os.urandom(16)).decode()}", "Sec-WebSocket-Version: 13"]
+        lines += [f"{name.replace('_', '-')}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        status = int((await asyncio.wait_for(reader.readline(), 5)).split()[1])
+        writer.close()
+        api.stop()
+        return status
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("origin", ["http://evil.example", "null", "http://127.0.0.1:1"])
+def test_websocket_refuses_other_origins(origin):
+    assert handshake_status(Origin=origin) == 403
+
+
+def test_websocket_accepts_same_host_and_non_browser_clients():
+    assert handshake_status() == 101
+    assert handshake_status(Origin="http://gate.local:8080", Host="gate.local:8080") == 101
+
+
+def test_websocket_needs_the_token_when_one_is_set():
+    assert handshake_status(token="secret") == 401
+    assert handshake_status(token="secret", target="/ws?token=wrong") == 401
+    assert handshake_status(token="secret", target="/ws?token=secret") == 101
+    assert handshake_status(token="secret", Authorization="Bearer secret") == 101
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+import serial
+
+pytest.importorskip("pty")
+
+from barrier import BarrierController, FakeBarrierDevice, open_serial
+
+
+@pytest.fixture
+def device():
+    device = FakeBarrierDevice()
+    yield device
+    device.close()
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+# Fails the first `failures` connection attempts, then opens the pty
+def flaky_connect(device, failures):
+    attempts = []
+
+    def connect():
+        attempts.append(time.monotonic())
+        if len(attempts) <= failures:
+            raise serial.SerialException("link down")
+        return open_serial(device.port)
+    return connect
+
+
+def command_times(device, command):
+    return [at for byte, at in device.received if byte == command]
+
+
+def test_opens_in_a_burst_coalesce_into_one_cycle(device):
+    controller = BarrierController(device.port, hold_seconds=0.3, settle_seconds=0).start()
+    try:
+        for _ in range(3):
+            controller.open()
+        assert wait_for(lambda: device.commands() == b"OC")
+    finally:
+        controller.stop()
+    stats = controller.stats()
+    assert stats["opens"] == 1
+    assert stats["coalesced"] == 2
+
+
+def test_open_while_up_extends_the_hold(device):
+    controller = BarrierController(device.port, hold_seconds=0.5, settle_seconds=0).start()
+    try:
+        controller.open()
+        assert wait_for(lambda: device.commands() == b"O")
+        time.sleep(0.3)
+        controller.open()
+        assert wait_for(lambda: device.commands() == b"OC")
+    finally:
+        controller.stop()
+    opened, = command_times(device, b"O")
+    closed, = command_times(device, b"C")
+    assert closed - opened >= 0.75
+    assert controller.stats()["coalesced"] == 1
+
+
+def test_open_during_link_outage_is_sent_after_reconnect(device):
+    controller = BarrierController(device.port, hold_seconds=0.2, settle_seconds=0, reconnect_interval=0.1,
+                                   connect=flaky_connect(device, failures=3)).start()
+    try:
+        controller.open()
+        controller.open()
+        assert wait_for(lambda: device.commands() == b"OC")
+    finally:
+        controller.stop()
+    stats = controller.stats()
+    assert stats["opens"] == 1
+    assert stats["coalesced"] == 1
+    assert stats["failures"] == 3
+    assert stats["reconnects"] == 1
+    assert stats["missed"] == 0
+
+
+def test_pending_open_is_given_up_after_the_deadline(device):
+    controller = BarrierController(device.port, settle_seconds=0, reconnect_interval=0.05, open_deadline=0.3,
+                                   connect=flaky_connect(device, failures=1000)).start()
+    try:
+        controller.open()
+        assert wait_for(lambda: controller.stats()["missed"] == 1)
+        assert not controller.stats()["pending"]
+    finally:
+        controller.stop()
+    assert controller.stats()["opens"] == 0
+    assert device.commands() == b""
+
+
+def test_write_error_drops_the_link_and_reconnects(device):
+    writes = []
+
+    class FailsOnce:
+        def __init__(self):
+            self.port = open_serial(device.port)
+
+        def write(self, data):
+            writes.append(data)
+            if len(writes) == 1:
+                raise serial.SerialException("write failed")
+            return self.port.write(data)
+
+        def flush(self):
+            self.port.flush()
+
+        def close(self):
+            self.port.close()
+
+    controller = BarrierController(device.port, hold_seconds=0.2, settle_seconds=0, reconnect_interval=0.05,
+                                   connect=FailsOnce).start()
+    try:
+        controller.open()
+        assert wait_for(lambda: device.commands() == b"OC")
+    finally:
+        controller.stop()
+    stats = controller.stats()
+    assert stats["opens"] == 1
+    assert stats["reconnects"] == 2
@@ -0,0 +1,14 @@
+from ocr_cache import PlateCache
+
+
+def test_entry_is_fresh_once_per_voter():
+    cache = PlateCache()
+    read = ("KA03MN4561", 0.9)
+    cache.put("key", read, ("lane", 1))
+    assert cache.get("key", ("lane", 1)) == (read, False)
+    assert cache.get("key", ("lane", 2)) == (read, True)
+    assert cache.get("key", ("lane", 2)) == (read, False)
+    assert cache.get("key") == (read, True)
+    assert cache.get("other", ("lane", 1)) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["repeats"]) == (4, 1, 2)
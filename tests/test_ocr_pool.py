@@ -0,0 +1,82 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from ocr_pool import OcrProcessPool
+
+CROP = np.full((40, 160, 3), 255, np.uint8)
+
+
+# Stands in for EasyOCR in the workers. State lives in files under `path` so it
+# survives worker restarts: the first `crashes` recognize() calls kill the
+# worker, loads number 2 .. 1 + `load_failures` raise, and recognize() sleeps
+# `delay` seconds.
+class FakeReader:
+    def __init__(self, path, crashes=0, load_failures=0, delay=0.0):
+        self.path = path
+        self.crashes = crashes
+        self.load_failures = load_failures
+        self.delay = delay
+
+    def _bump(self, name):
+        count = len([f for f in os.listdir(self.path) if f.startswith(name)]) + 1
+        open(os.path.join(self.path, f"{name}-{count}"), "w").close()
+        return count
+
+    def __call__(self):
+        if 1 < self._bump("load") <= 1 + self.load_failures:
+            raise MemoryError("cannot load reader")
+        return self
+
+    def recognize(self, canvas, horizontal_list, free_list, batch_size):
+        if self._bump("read") <= self.crashes:
+            os._exit(1)
+        time.sleep(self.delay)
+        return [(((box[0], box[2]),), "KA01AB1234", 0.9) for box in horizontal_list]
+
+
+@pytest.fixture
+def make_pool(tmp_path):
+    pools = []
+
+    def make(**kw):
+        reader = FakeReader(str(tmp_path), **{k: kw.pop(k) for k in ("crashes", "load_failures", "delay") if k in kw})
+        pool = OcrProcessPool(1, load_reader=reader, slot_bytes=1 << 16, **kw).start()
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.stop()
+
+
+def test_load_failure_after_a_crash_does_not_hang_reads(make_pool):
+    pool = make_pool(crashes=1, load_failures=2, timeout=20.0).wait_ready(timeout=60)
+    start = time.monotonic()
+    assert pool.read([CROP]) == [None]
+    assert time.monotonic() - start < 15
+    assert "MemoryError" in pool.stats()["last_error"]
+
+    deadline = time.monotonic() + 30
+    while pool.read([CROP]) != [("KA01AB1234", 0.9)]:
+        assert time.monotonic() < deadline
+    stats = pool.stats()
+    assert stats["restarts"] >= 3
+    assert stats["ready"] == 1
+    assert stats["free_slots"] == pool.slots
+
+
+def test_slow_reads_time_out(make_pool):
+    pool = make_pool(delay=5.0, timeout=0.5).wait_ready(timeout=60)
+    with pytest.raises(TimeoutError):
+        pool.read([CROP])
+
+
+def test_load_failure_at_startup_is_fatal(make_pool, tmp_path):
+    # Counts as an earlier load, so the worker's first load is one that fails
+    open(tmp_path / "load-0", "w").close()
+    pool = make_pool(load_failures=1)
+    with pytest.raises(RuntimeError, match="MemoryError"):
+        pool.wait_ready(timeout=60)
@@ -0,0 +1,66 @@
+import queue
+
+import cv2
+import numpy as np
+
+from ocr_cache import PlateCache
+from pipeline import CameraStream, DetectionPipeline
+from tracker import PlateTracker
+
+BOX = (10, 10, 90, 50)
+
+
+def static_clip(path, frames=30):
+    image = np.random.RandomState(0).randint(0, 255, (120, 160, 3)).astype(np.uint8)
+    for i in range(frames):
+        cv2.imwrite(str(path / f"{i:03d}.png"), image)
+    return str(path)
+
+
+def run(pipeline):
+    results = []
+    pipeline.start()
+    while pipeline.running():
+        pipeline.drain_confirmed()
+        try:
+            results.append(pipeline.get_result(timeout=0.2))
+        except queue.Empty:
+            pass
+    pipeline.stop()
+    return results
+
+
+def test_static_track_is_served_from_the_cache_without_new_votes(tmp_path):
+    calls = []
+
+    def recognize(crops):
+        calls.append(len(crops))
+        return [("KA03MN4561", 0.9) for _ in crops]
+
+    tracker = PlateTracker()
+    camera = CameraStream("lane", static_clip(tmp_path), tracker=tracker, lossless=True)
+    cache = PlateCache()
+    pipeline = DetectionPipeline([camera], lambda images: [[BOX] for _ in images], recognize,
+                                 ocr_workers=1, lossless=True, ocr_cache=cache)
+    results = run(pipeline)
+
+    assert len(results) == 30
+    assert all(result.plates[0].text == "KA03MN4561" for result in results)
+    assert calls == [1]
+    stats = cache.stats()
+    assert stats["hits"] == 29
+    assert stats["repeats"] == 29
+    track, = tracker.tracks.values()
+    assert track.reads == 1
+
+
+def test_results_carry_the_source_file_past_unreadable_images(tmp_path):
+    static_clip(tmp_path, frames=4)
+    (tmp_path / "001b.png").write_bytes(b"not an image")
+    camera = CameraStream("lane", str(tmp_path), lossless=True)
+    pipeline = DetectionPipeline([camera], lambda images: [[] for _ in images], lambda crops: [],
+                                 ocr_workers=1, lossless=True)
+    results = run(pipeline)
+
+    assert [(result.frame_id, result.source) for result in results] == [
+        (1, "000.png"), (2, "001.png"), (3, "002.png"), (4, "003.png")]
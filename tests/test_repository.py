@@ -0,0 +1,38 @@
+import sqlite3
+
+from authcache import AuthCache
+from repository import Repository
+
+
+def change_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*), MIN(seq), MAX(seq) FROM change_log").fetchone()
+
+
+def test_bulk_imports_keep_the_change_log_bounded(tmp_path):
+    path = str(tmp_path / "vehicles.db")
+    repo = Repository(path, keep_changes=100)
+    repo.ensure_schema([50])
+    cache = AuthCache(repo, poll_interval=3600)
+    assert change_rows(path)[0] == 50
+
+    for start in range(0, 1000, 250):
+        repo.upsert_vehicles([(f"KA01AB{n:04d}", "Owner", "Car", 1) for n in range(start, start + 250)])
+    count, first, last = change_rows(path)
+    assert count == 100
+    assert (first, last) == (last - 99, 1050)
+
+    # Rows the cache had not seen were pruned, so it reloads instead of missing them
+    reloads = cache.reloads
+    cache._follow_changes()
+    assert cache.reloads == reloads + 1
+    assert cache.vehicle("KA01AB0000") is not None
+    repo.pool.close()
+
+
+def test_ensure_schema_prunes_an_existing_log(tmp_path):
+    path = str(tmp_path / "vehicles.db")
+    Repository(path, keep_changes=10000).ensure_schema([300])
+    assert change_rows(path)[0] == 300
+    Repository(path, keep_changes=10).ensure_schema([300])
+    assert change_rows(path)[0] == 10
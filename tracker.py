@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import defaultdict
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def centroid_distance(a, b):
+    ax, ay = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2
+    bx, by = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.misses = 0
+        self.reads = 0
+        self.votes = defaultdict(list)
+        self.plate = None
+        self.confidence = 0.0
+
+    def best(self):
+        if not self.votes:
+            return None, 0, 0.0
+        text, confs = max(self.votes.items(), key=lambda item: (len(item[1]), sum(item[1])))
+        return text, len(confs), sum(confs) / len(confs)
+
+
+# IoU/centroid tracker over YOLO boxes. Each track accumulates OCR reads and
+# settles on a plate once enough reads agree; OCR is skipped after that.
+# normalize(text) -> plate or None corrects reads before they vote; plates for
+# which known(plate) is true settle after known_votes reads instead of min_votes.
+class PlateTracker:
+    def __init__(self, iou_threshold=0.3, max_misses=15, min_votes=3, min_confidence=0.5,
+                 max_reads=12, cooldown=5.0, validate=None, normalize=None, known=None, known_votes=None):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_votes = min_votes
+        self.min_confidence = min_confidence
+        self.max_reads = max_reads
+        self.cooldown = cooldown
+        self.validate = validate
+        self.normalize = normalize
+        self.known = known
+        self.known_votes = min_votes if known_votes is None else known_votes
+        self.tracks = {}
+        self.recent = {}
+        self.next_id = 1
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def _match(self, boxes):
+        pairs = []
+        for track_id, track in self.tracks.items():
+            for i, box in enumerate(boxes):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, track_id, i))
+        pairs.sort(reverse=True)
+
+        matches = {}
+        used_tracks = set()
+        for _, track_id, i in pairs:
+            if track_id in used_tracks or i in matches:
+                continue
+            matches[i] = track_id
+            used_tracks.add(track_id)
+
+        # Fast movers can lose all overlap between frames, fall back to centroids
+        for i, box in enumerate(boxes):
+            if i in matches:
+                continue
+            limit = 0.5 * max(box[2] - box[0], box[3] - box[1])
+            candidates = [(centroid_distance(track.box, box), track_id)
+                          for track_id, track in self.tracks.items() if track_id not in used_tracks]
+            if candidates:
+                distance, track_id = min(candidates)
+                if distance <= limit:
+                    matches[i] = track_id
+                    used_tracks.add(track_id)
+        return matches
+
+    # Returns (track_id, box, needs_ocr) for every box in the frame
+    def update(self, boxes):
+        with self.lock:
+            matches = self._match(boxes)
+            seen = set()
+            out = []
+            for i, box in enumerate(boxes):
+                track_id = matches.get(i)
+                if track_id is None:
+                    track_id = self.next_id
+                    self.next_id += 1
+                    self.tracks[track_id] = Track(track_id, box)
+                track = self.tracks[track_id]
+                track.box = box
+                track.misses = 0
+                seen.add(track_id)
+                out.append((track_id, box, self._needs_ocr(track)))
+
+            for track_id in list(self.tracks):
+                if track_id in seen:
+                    continue
+                self.tracks[track_id].misses += 1
+                if self.tracks[track_id].misses > self.max_misses:
+                    del self.tracks[track_id]
+                    self.evicted += 1
+
+            now = time.monotonic()
+            for plate in [p for p, t in self.recent.items() if now - t > self.cooldown]:
+                del self.recent[plate]
+            return out
+
+    def _needs_ocr(self, track):
+        return track.plate is None and track.reads < self.max_reads
+
+    def plate_for(self, track_id):
+        with self.lock:
+            track = self.tracks.get(track_id)
+            return (track.plate, track.confidence) if track else (None, 0.0)
+
+    # Record an OCR read; returns (plate, confidence) the first time a track
+    # reaches consensus, None otherwise
+    def add_read(self, track_id, text, confidence):
+        with self.lock:
+            track = self.tracks.get(track_id)
+            if track is None or track.plate is not None:
+                return None
+            track.reads += 1
+            if text and self.normalize:
+                text = self.normalize(text)
+            if not text or (self.validate and not self.validate(text)):
+                return None
+            track.votes[text].append(confidence)
+
+            plate, votes, mean_conf = track.best()
+            total = sum(len(confs) for confs in track.votes.values())
+            needed = self.known_votes if self.known and self.known(plate) else self.min_votes
+            if votes < needed or mean_conf < self.min_confidence or votes * 2 <= total:
+                return None
+            track.plate = plate
+            track.confidence = mean_conf
+
+            # A car briefly occluded comes back as a new track; do not report it twice
+            now = time.monotonic()
+            if plate in self.recent and now - self.recent[plate] <= self.cooldown:
+                self.recent[plate] = now
+                return None
+            self.recent[plate] = now
+            return plate, mean_conf
+
+    def active(self):
+        with self.lock:
+            return len(self.tracks)
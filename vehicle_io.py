@@ -0,0 +1,178 @@
+# Bulk import/export of the vehicle registry as CSV or XLSX (the
+# vehicle_log.xlsx layout: id, number_plate, owner_name, vehicle_type, allowed).
+# Rows are streamed, validated and upserted chunk by chunk, so a file of any
+# size never sits in memory and a bad row is reported instead of aborting the
+# import.
+#
+#   python vehicle_io.py import residents.xlsx --rejects rejects.csv
+#   python vehicle_io.py export registry.csv
+import argparse
+import csv
+import time
+from collections import namedtuple
+
+from plates import clean_plate_text, is_valid_plate
+
+COLUMNS = ("number_plate", "owner_name", "vehicle_type", "allowed")
+EXPORT_COLUMNS = ("id",) + COLUMNS
+ALLOWED_VALUES = {"1": 1, "0": 0, "yes": 1, "no": 0, "y": 1, "n": 0, "true": 1, "false": 0, "": 1}
+
+Reject = namedtuple("Reject", "line plate reason")
+ImportResult = namedtuple("ImportResult", "read imported rejected seconds")
+
+
+def _is_xlsx(path):
+    return path.lower().endswith((".xlsx", ".xlsm"))
+
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError("XLSX import/export needs openpyxl (pip install openpyxl)")
+    return openpyxl
+
+
+def _xlsx_rows(path):
+    workbook = _openpyxl().load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _csv_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.reader(f)
+
+
+# (line number, {column: value}) for every data row; the header row names the
+# columns, so their order and any extra columns (like id) do not matter
+def read_rows(path):
+    rows = _xlsx_rows(path) if _is_xlsx(path) else _csv_rows(path)
+    header = next(rows, None)
+    if header is None:
+        return
+    names = [str(name).strip().lower() if name is not None else "" for name in header]
+    missing = [column for column in COLUMNS[:3] if column not in names]
+    if missing:
+        raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+    positions = [(column, names.index(column)) for column in COLUMNS if column in names]
+    for line, row in enumerate(rows, start=2):
+        if not any(value not in (None, "") for value in row):
+            continue
+        yield line, {column: row[i] if i < len(row) else None for column, i in positions}
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+# (vehicle tuple, None) or (None, reason)
+def validate(record):
+    plate = clean_plate_text(_text(record.get("number_plate")))
+    if not plate:
+        return None, "missing number_plate"
+    if not is_valid_plate(plate):
+        return None, f"invalid number_plate {plate}"
+    owner, vehicle_type = _text(record.get("owner_name")), _text(record.get("vehicle_type"))
+    if not owner:
+        return None, "missing owner_name"
+    if not vehicle_type:
+        return None, "missing vehicle_type"
+    allowed = ALLOWED_VALUES.get(_text(record.get("allowed")).lower())
+    if allowed is None:
+        return None, f"allowed must be 0/1, got {record.get('allowed')!r}"
+    return (plate, owner, vehicle_type, allowed), None
+
+
+# Upserts every valid row, chunk rows per transaction. Later rows for the same
+# plate win. on_reject(Reject) is called for each row that fails validation.
+def import_vehicles(repo, path, chunk=5000, on_reject=None):
+    start = time.perf_counter()
+    read = imported = rejected = 0
+    batch = []
+    for line, record in read_rows(path):
+        read += 1
+        vehicle, reason = validate(record)
+        if vehicle is None:
+            rejected += 1
+            if on_reject:
+                on_reject(Reject(line, _text(record.get("number_plate")), reason))
+            continue
+        batch.append(vehicle)
+        if len(batch) == chunk:
+            imported += repo.upsert_vehicles(batch)
+            batch = []
+    if batch:
+        imported += repo.upsert_vehicles(batch)
+    return ImportResult(read, imported, rejected, time.perf_counter() - start)
+
+
+def _export_rows(repo):
+    for number, vehicle in enumerate(repo.iter_vehicles(), start=1):
+        yield (number,) + tuple(vehicle)
+
+
+def export_vehicles(repo, path):
+    count = 0
+    if _is_xlsx(path):
+        workbook = _openpyxl().Workbook(write_only=True)
+        sheet = workbook.create_sheet("vehicles")
+        sheet.append(EXPORT_COLUMNS)
+        for row in _export_rows(repo):
+            sheet.append(row)
+            count += 1
+        workbook.save(path)
+        return count
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in _export_rows(repo):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def main():
+    from repository import default_repository
+
+    parser = argparse.ArgumentParser(description="Bulk import or export registered vehicles")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help=".csv or .xlsx file")
+    parser.add_argument("--chunk", type=int, default=5000, help="rows per transaction on import")
+    parser.add_argument("--rejects", help="write rejected rows to this CSV instead of printing them")
+    args = parser.parse_args()
+
+    repo = default_repository()
+    if args.command == "export":
+        start = time.perf_counter()
+        count = export_vehicles(repo, args.path)
+        print(f"{count} vehicles written to {args.path} in {time.perf_counter() - start:.2f}s")
+        return
+
+    report = open(args.rejects, "w", newline="") if args.rejects else None
+    if report:
+        writer = csv.writer(report)
+        writer.writerow(Reject._fields)
+        on_reject = writer.writerow
+    else:
+        on_reject = lambda reject: print(f"line {reject.line}: {reject.reason}")
+    try:
+        result = import_vehicles(repo, args.path, args.chunk, on_reject)
+    finally:
+        if report:
+            report.close()
+    rate = result.read / result.seconds if result.seconds else 0
+    print(f"{result.read} rows read, {result.imported} imported, {result.rejected} rejected "
+          f"in {result.seconds:.2f}s ({rate:,.0f} rows/s)")
+    if report and result.rejected:
+        print(f"Rejected rows written to {args.rejects}")
+
+
+if __name__ == "__main__":
+    main()